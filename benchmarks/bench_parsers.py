@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Parser benchmarks: throughput, peak memory and correctness per source fixture
+"""
+import gzip
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sources import load_sources, parse_listings  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+
+def bench_fixture(source, content: bytes, expected: list, min_time: float = 1.0) -> Dict:
+    """Time parse_listings on one page until min_time has passed"""
+    listings = parse_listings(source, content)  # warm-up, also compiles selectors
+
+    rounds = 0
+    start = time.perf_counter()
+    while True:
+        parse_listings(source, content)
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    tracemalloc.start()
+    parse_listings(source, content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    got = {(item.title, item.url, item.price) for item in listings}
+    want = {tuple(listing) for listing in expected}
+    matched = len(got & want)
+    per_round = elapsed / rounds
+    return {
+        'source': source.key,
+        'bytes': len(content),
+        'listings': len(listings),
+        'rounds': rounds,
+        'seconds_per_page': per_round,
+        'listings_per_sec': len(listings) / per_round,
+        'mb_per_sec': len(content) / per_round / 1e6,
+        'peak_memory_bytes': peak,
+        'precision': matched / len(got) if got else 1.0,
+        'recall': matched / len(want) if want else 1.0,
+    }
+
+
+def run(min_time: float = 1.0) -> Dict[str, Dict]:
+    """Benchmark every fixture listed in fixtures/expected.json"""
+    sources = {source.key: source for source in load_sources({})}
+    with open(FIXTURES / 'expected.json', encoding='utf-8') as f:
+        expected = json.load(f)
+
+    results = {}
+    for name, fixture in expected.items():
+        with gzip.open(FIXTURES / f'{name}.gz', 'rb') as f:
+            content = f.read()
+        results[name] = bench_fixture(sources[fixture['source']], content, fixture['listings'], min_time)
+        r = results[name]
+        print(f"  {name}: {r['listings_per_sec']:.0f} listings/s, {r['mb_per_sec']:.2f} MB/s, "
+              f"peak {r['peak_memory_bytes'] / 1e6:.1f} MB, recall {r['recall']:.2f}", file=sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    json.dump(run(), sys.stdout, indent=2)
+    print()
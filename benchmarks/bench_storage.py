@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Item store benchmarks: listings stored per second, one batch per source, and full-text query time
+"""
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sources import Listing  # noqa: E402
+from storage import ItemStore  # noqa: E402
+
+SIZES = [1000, 10000]
+BATCH = 50  # items per source, as in a run with max_results_per_source at its default
+NOW = datetime(2026, 1, 1, 9, 0)
+QUERIES = ['wool coat', 'coat 123', 'vintage']
+
+
+def listings(rows: int) -> List[Listing]:
+    return [Listing(
+        id=f'{i:032x}',
+        title=f'Vintage Wool Coat {i}',
+        url=f'https://www.example.com/itm/{i}',
+        price=f'EUR {i % 500},00',
+        source='eBay',
+        image_url=f'https://img.example.com/{i}.jpg',
+    ) for i in range(rows)]
+
+
+def ingest(store: ItemStore, items: List[Listing], run_id: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(items), BATCH):
+        store.mark_items_seen(items[i:i + BATCH], run_id, NOW)
+    return time.perf_counter() - start
+
+
+def bench_size(rows: int) -> Dict:
+    items = listings(rows)
+    # The store reports migrations on stdout, which carries the JSON results
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        store = ItemStore(os.path.join(tmp, 'seen_items.db'))
+        new_seconds = ingest(store, items, store.start_run(NOW))
+        # A second run sees the same listings again
+        seen_seconds = ingest(store, items, store.start_run(NOW))
+        start = time.perf_counter()
+        for text in QUERIES:
+            store.search(text)
+        query_seconds = (time.perf_counter() - start) / len(QUERIES)
+        store.close()
+    return {
+        'rows': rows,
+        'seconds': new_seconds,
+        'rows_per_sec': rows / new_seconds,
+        'seen_rows_per_sec': rows / seen_seconds,
+        'query_ms': query_seconds * 1000,
+    }
+
+
+def run(sizes: List[int] = SIZES) -> Dict[str, Dict]:
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = r = bench_size(rows)
+        print(f"  ingest {rows} rows: {r['rows_per_sec']:.0f} new/s, {r['seen_rows_per_sec']:.0f} seen/s, "
+              f"{r['query_ms']:.1f} ms/query", file=sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    json.dump(run([int(size) for size in sys.argv[1:]] or SIZES), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Website generation benchmarks at growing catalog sizes
+"""
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_website import generate_website  # noqa: E402
+from sources import Listing  # noqa: E402
+from storage import ItemStore  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+SOURCES = ['eBay', 'eBay UK', 'Kleinanzeigen', 'Google Shopping (Zalando)', 'Etsy', 'Vinted']
+NOW = datetime(2026, 1, 1, 9, 0)
+BATCH = 60
+
+
+def build_database(path: str, rows: int):
+    """Fill a seen_items database with `rows` deterministic listings, found an hour apart in batches"""
+    rng = random.Random(rows)
+    items = [Listing(
+        id=f'{i:032x}',
+        title=f'Vintage Wool Coat "{i}" <Gr. {rng.choice([46, 48, 50, 52])}>',
+        url=f'https://www.example.com/itm/{i}?a=1&b=2',
+        price=f'EUR {rng.randint(10, 500)},00',
+        source=rng.choice(SOURCES),
+        image_url=f'https://img.example.com/{i}.jpg' if i % 5 else '',
+    ) for i in range(rows)]
+
+    store = ItemStore(path)
+    # Oldest batch first, one run per day of history
+    batches = range((rows - 1) // BATCH, -1, -1)
+    for batch in batches:
+        found = NOW - timedelta(hours=batch)
+        if batch % 24 == 23 or batch == batches[0]:
+            run_id = store.start_run(found)
+        store.mark_items_seen(items[batch * BATCH:(batch + 1) * BATCH], run_id, found)
+    store.close()
+
+
+def bench_size(rows: int) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, output_path = os.path.join(tmp, 'seen_items.db'), os.path.join(tmp, 'index.html')
+        # generate_website reports on stdout, which carries the JSON results
+        with contextlib.redirect_stdout(sys.stderr):
+            build_database(db_path, rows)
+
+            start = time.perf_counter()
+            generate_website(db_path, output_path, NOW, full=True)
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            generate_website(db_path, output_path, NOW, full=True)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Nothing changed since the last build, as on a day without finds
+            start = time.perf_counter()
+            generate_website(db_path, output_path, NOW)
+            incremental = time.perf_counter() - start
+
+        return {
+            'rows': rows,
+            'seconds': elapsed,
+            'rows_per_sec': rows / elapsed,
+            'incremental_seconds': incremental,
+            'peak_memory_bytes': peak,
+            # The page plus its data shards
+            'output_bytes': sum(os.path.getsize(os.path.join(root, name))
+                                for root, _, names in os.walk(tmp) for name in names if name != 'seen_items.db'),
+        }
+
+
+def run(sizes: List[int] = SIZES) -> Dict[str, Dict]:
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = r = bench_size(rows)
+        print(f"  generate_website {rows} rows: {r['seconds']:.2f}s, {r['incremental_seconds']:.2f}s incremental, "
+              f"peak {r['peak_memory_bytes'] / 1e6:.1f} MB", file=sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    json.dump(run([int(size) for size in sys.argv[1:]] or SIZES), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Build the search-result fixtures used by the parser benchmarks
+
+Pages mirror the markup each site served when its selectors were written,
+padded with the navigation, filters and inline scripts that make up most of a
+real page. Every fixture comes with the listings a correct parser extracts, in
+expected.json. Pass --from-archive to add pages from a `scraper.py --record`
+archive instead (their expected output is whatever the current parser returns).
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sources import load_sources, parse_listings  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+TITLES = [
+    'Vintage Herringbone Mantel Wolle', 'CP Company Reversible Wool Overcoat', 'Loden Jacke Trachten',
+    '70s Camel Hair Coat', 'Barbour Waxed Jacket', 'C.P. Company Flecked Wool Coat', 'Burberry Trenchcoat Beige',
+    'Donegal Tweed Sakko', 'Crombie Style Overcoat Navy', 'Dufflecoat Vintage Grün',
+]
+PRICES = ['{a} € VB', 'EUR {a},00', '£{a}.00', '{k}.{a:03d},50 €', '{a},00 € + Versand', 'US ${a}.99']
+
+
+def title(rng, i):
+    return f'{rng.choice(TITLES)} Gr. {rng.choice([44, 46, 48, 50, 52, 54])} #{i}'
+
+
+def price(rng):
+    return rng.choice(PRICES).format(a=rng.randint(10, 400), k=rng.randint(1, 3))
+
+
+def noise(rng, links=200, script_kb=30):
+    nav = ''.join(f'<div class="nav-item"><a href="/c/{i}"><span>Category {i}</span></a></div>' for i in range(links))
+    filters = ''.join(f'<li class="x-refine"><input type="checkbox" id="f{i}"><label for="f{i}">Filter {i}</label></li>'
+                      for i in range(links))
+    script = '<script>window.__STATE__="' + ''.join(rng.choice('abcdef0123456789') for _ in range(script_kb * 1024)) + '";</script>'
+    return f'<nav>{nav}</nav><aside><ul>{filters}</ul></aside>{script}'
+
+
+def page(rng, body):
+    return f'<!DOCTYPE html><html><head><title>Search</title></head><body>{noise(rng)}{body}{noise(rng, 50, 5)}</body></html>'
+
+
+def kleinanzeigen(rng, n=27):
+    expected, cards = [], []
+    for i in range(n):
+        t, p = title(rng, i), price(rng)
+        href = f'/s-anzeige/mantel-{i}/{2700000000 + i}-153-3331'
+        cards.append(
+            f'<li class="ad-listitem"><article class="aditem" data-adid="{2700000000 + i}" data-href="{href}">'
+            f'<div class="aditem-image"><img src="https://img.kleinanzeigen.de/api/v1/prod-ads/images/{i}.jpg"></div>'
+            f'<div class="aditem-main"><div class="aditem-main--top">Berlin</div><h2 class="text-module-begin">'
+            f'<a class="ellipsis" href="{href}">{t}</a></h2><p class="aditem-main--middle--description">Wenig getragen</p>'
+            f'<div class="aditem-main--middle--price-shipping"><p class="aditem-main--middle--price-shipping--price">{p}</p>'
+            f'</div></div></article></li>')
+        expected.append((t, 'https://www.kleinanzeigen.de' + href, p))
+    return page(rng, f'<ul id="srchrslt-adtable">{"".join(cards)}</ul>'), expected
+
+
+def ebay(rng, domain, header, n=61):
+    expected, cards = [], []
+    for i in range(n):
+        t = header if i == 0 else title(rng, i)
+        p, url = price(rng), f'https://www.{domain}/itm/{315000000000 + i}?hash=item{i}&_trksid=p4432023'
+        rows = ''.join(f'<div class="s-card__attribute-row"><span class="su-styled-text secondary">Attr {j}</span></div>'
+                       for j in range(6))
+        cards.append(
+            f'<li class="s-card s-card--horizontal" id="item{i}"><div class="su-card-container">'
+            f'<div class="su-media"><img class="s-card__image" src="https://i.ebayimg.com/images/g/{i}/s-l500.webp"></div>'
+            f'<div class="su-card-container__content"><a class="su-link" href="{url.replace("&", "&amp;")}">'
+            f'<div class="s-card__title"><span class="su-styled-text primary default">{t}</span></div></a>'
+            f'{rows}<div class="s-card__attribute-row"><span class="su-styled-text s-card__price">{p}</span></div>'
+            f'</div></div></li>')
+        expected.append((t, url, p) if i else None)
+    return page(rng, f'<ul class="srp-results srp-list clearfix">{"".join(cards)}</ul>'), expected
+
+
+def vinted(rng, n=24):
+    expected, cards = [], []
+    for i in range(n):
+        t, p = title(rng, i), price(rng)
+        cards.append(f'<div class="feed-grid__item"><div class="new-item-box"><a href="/items/{4100000 + i}-coat">'
+                     f'<img src="https://images.vinted.net/{i}.jpeg"><h3>{t}</h3></a><span class="price">{p}</span></div></div>')
+        expected.append((t, f'https://www.vinted.de/items/{4100000 + i}-coat', p))
+    return page(rng, f'<div class="feed-grid">{"".join(cards)}</div>'), expected
+
+
+def google(rng, n=10):
+    expected, cards = [], []
+    for i in range(n):
+        t = title(rng, i)
+        url = 'https://www.youtube.com/watch?v=coat' if i == 2 else f'https://shop{i}.example.de/products/coat-{i}'
+        cards.append(f'<div class="g"><div class="yuRUbf"><a href="{url}"><h3 class="LC20lb">{t}</h3></a></div>'
+                     f'<div class="VwiC3b">Vintage coats in Berlin</div></div>')
+        expected.append(None if 'youtube' in url else (t, url, 'N/A'))
+    return page(rng, f'<div id="search">{"".join(cards)}</div>'), expected
+
+
+def shop(rng, base_url, n=24):
+    expected, cards = [], []
+    for i in range(n):
+        t, p = title(rng, i), price(rng)
+        cards.append(f'<div class="product-item"><a class="product-item__image" href="/products/coat-{i}">'
+                     f'<img src="//cdn.shopify.com/s/files/{i}.jpg"></a><h3 class="product-item__title">{t}</h3>'
+                     f'<span class="price-item price-item--regular">{p}</span></div>')
+        expected.append((t, f'{base_url}/products/coat-{i}', p))
+    return page(rng, f'<div class="collection">{"".join(cards)}</div>'), expected
+
+
+def etsy(rng, n=40):
+    expected, cards = [], []
+    for i in range(n):
+        t, p = title(rng, i), price(rng)
+        url = f'https://www.etsy.com/listing/{1500000000 + i}/vintage-coat'
+        cards.append(f'<div class="v2-listing-card" data-listing-id="{1500000000 + i}"><a href="{url}">'
+                     f'<img src="https://i.etsystatic.com/{i}.jpg"><h3 class="v2-listing-card__title">{t}</h3></a>'
+                     f'<span class="currency-value lc-price">{p}</span></div>')
+        expected.append((t, url, p))
+    return page(rng, f'<div class="search-listings-group">{"".join(cards)}</div>'), expected
+
+
+def google_shopping(rng, n=40):
+    results, expected = [], []
+    for i in range(n):
+        t, p, store = title(rng, i), price(rng), rng.choice(['Zalando', 'eBay', 'Vinted', 'Etsy'])
+        link = '' if i == 5 else f'https://www.google.com/shopping/product/{9000 + i}'
+        results.append({'position': i + 1, 'title': t, 'price': p, 'product_link': link, 'source': store,
+                        'thumbnail': f'https://encrypted-tbn0.gstatic.com/{i}', 'rating': 4.5, 'reviews': i})
+        expected.append((t, link, p) if link else None)
+    return json.dumps({'search_metadata': {'status': 'Success'}, 'shopping_results': results}), expected
+
+
+def builtin_fixtures():
+    """(source key, fixture name, content, expected listings) for every built-in source
+
+    Expected listings hold None for containers a parser must skip.
+    """
+    rng = random.Random(2024)
+    yield ('google_shopping', 'google_shopping.json') + google_shopping(rng)
+    yield ('kleinanzeigen', 'kleinanzeigen.html') + kleinanzeigen(rng)
+    yield ('ebay', 'ebay.html') + ebay(rng, 'ebay.de', 'Ergebnisse')
+    yield ('ebay_uk', 'ebay_uk.html') + ebay(rng, 'ebay.co.uk', 'Shop on eBay')
+    yield ('vinted', 'vinted.html') + vinted(rng)
+    yield ('google', 'google.html') + google(rng)
+    yield ('vintage_threads', 'vintage_threads.html') + shop(rng, 'https://vintage-threads.com')
+    yield ('vilis_vintage', 'vilis_vintage.html') + shop(rng, 'https://www.vilisvintage.com')
+    yield ('etsy', 'etsy.html') + etsy(rng)
+
+
+def archive_fixtures(path):
+    """Fixtures from a scraper.py --record archive, one per recorded search page"""
+    sources = load_sources({})
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        f.readline()  # archive header
+        for n, line in enumerate(f):
+            exchange = json.loads(line)
+            source = next((s for s in sources if s.host and s.host in exchange['key']), None)
+            if source is None or exchange['status'] != 200:
+                continue
+            content = base64.b64decode(exchange['body'])
+            expected = [(i.title, i.url, i.price) for i in parse_listings(source, content)]
+            yield source.key, f'recorded_{source.key}_{n}.html', content, expected
+
+
+def write_fixture(name, content):
+    data = content if isinstance(content, bytes) else content.encode('utf-8')
+    # mtime=0 keeps the files byte-identical between builds
+    with open(FIXTURES / f'{name}.gz', 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+        f.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build parser benchmark fixtures')
+    parser.add_argument('--from-archive', metavar='ARCHIVE', help='also add pages from a --record archive')
+    args = parser.parse_args()
+
+    FIXTURES.mkdir(exist_ok=True)
+    sources = {source.key: source for source in load_sources({})}
+    fixtures = list(builtin_fixtures())
+    if args.from_archive:
+        fixtures += list(archive_fixtures(args.from_archive))
+
+    expected = {}
+    for key, name, content, listings in fixtures:
+        write_fixture(name, content)
+        # The per-page cap counts listing containers, including ones that are skipped (None)
+        listings = [listing for listing in listings[:sources[key].max_per_term] if listing]
+        expected[name] = {'source': key, 'listings': [list(listing) for listing in listings]}
+        print(f"  {name}: {len(listings)} listings")
+
+    with open(FIXTURES / 'expected.json', 'w', encoding='utf-8') as f:
+        json.dump(expected, f, indent=1, ensure_ascii=False)
+        f.write('\n')
+    print(f"✓ Wrote {len(expected)} fixtures to {FIXTURES}")
+
+
+if __name__ == '__main__':
+    main()
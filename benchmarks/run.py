@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Run all benchmarks and write machine-readable results
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --compare base.json bench.json
+"""
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bench_parsers  # noqa: E402
+import bench_storage  # noqa: E402
+import bench_website  # noqa: E402
+
+# (section, metric, True if higher is better)
+COMPARED_METRICS = [
+    ('parsers', 'listings_per_sec', True),
+    ('parsers', 'peak_memory_bytes', False),
+    ('parsers', 'recall', True),
+    ('website', 'seconds', False),
+    ('website', 'incremental_seconds', False),
+    ('website', 'peak_memory_bytes', False),
+    ('storage', 'rows_per_sec', True),
+    ('storage', 'query_ms', False),
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(base: Dict, head: Dict, threshold: float) -> int:
+    """Print metric changes between two result files; returns how many regressed"""
+    regressions = 0
+    for section, metric, higher_is_better in COMPARED_METRICS:
+        for name, head_result in head.get(section, {}).items():
+            base_result = base.get(section, {}).get(name)
+            if not base_result or not base_result.get(metric):
+                continue
+            change = head_result[metric] / base_result[metric] - 1
+            regressed = change < -threshold if higher_is_better else change > threshold
+            regressions += regressed
+            flag = '  ⚠ REGRESSION' if regressed else ''
+            print(f"{section}/{name} {metric}: {base_result[metric]:.4g} → {head_result[metric]:.4g} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the parser, website and storage benchmarks')
+    parser.add_argument('--output', help='write results to this JSON file (default: stdout)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to spend on each parser fixture')
+    parser.add_argument('--sizes', type=int, nargs='+', default=bench_website.SIZES, help='website row counts')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='compare two result files instead')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            head = json.load(f)
+        sys.exit(1 if compare(base, head, args.threshold) else 0)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results = {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parsers': bench_parsers.run(args.min_time),
+            'website': bench_website.run(args.sizes),
+            'storage': bench_storage.run(),
+        }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"✓ Wrote benchmark results to {args.output}")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Duplicate detection: canonical URLs for exact matches, SimHash for near-duplicate titles
+
+The same coat turns up under several URLs (tracking parameters, eBay DE and
+eBay UK sharing one item number) and under slightly different titles (a shop's
+listing found again through Google Shopping). Canonical URLs give an item one
+id wherever it is found; SimHash fingerprints group near-duplicate titles into
+clusters. Fingerprints are split into bands that are looked up exactly, so a
+new item is only compared with the few stored items sharing a band.
+"""
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {'_trksid', '_trkparms', 'hash', 'amdata', 'mkevt', 'mkcid', 'mkrid', 'campid', 'toolid',
+                   'gclid', 'fbclid', 'msclkid', 'srsltid', 'ref', 'ref_', 'click_key', 'click_sum', 'ga_order',
+                   'ga_search_type', 'ga_view_type', 'ga_search_query', 'referrer', 'pro', 'frs', 'sts', 'sr_prefetch',
+                   'variant', 'sca_ref', 'sca_source'}
+
+# (host pattern, path pattern, canonical URL for the listing id)
+CANONICAL_RULES = [
+    (r'(^|\.)ebay\.[a-z.]+$', r'/itm/(?:[^/]+/)?(\d{9,})', 'https://www.ebay.com/itm/{0}'),
+    (r'(^|\.)kleinanzeigen\.de$', r'/s-anzeige/(?:[^/]+/)?(\d+)', 'https://www.kleinanzeigen.de/s-anzeige/{0}'),
+    (r'(^|\.)etsy\.com$', r'/(?:[a-z-]+/)?listing/(\d+)', 'https://www.etsy.com/listing/{0}'),
+    (r'(^|\.)vinted\.[a-z.]+$', r'/items/(\d+)', 'https://{host}/items/{0}'),
+    (r'(^|\.)google\.[a-z.]+$', r'/shopping/product/(\d+)', 'https://www.google.com/shopping/product/{0}'),
+]
+
+SIMHASH_BITS = 64
+MASK = (1 << SIMHASH_BITS) - 1
+SHINGLE = 4                     # characters per feature
+BANDS = 8                       # 8-bit bands: fingerprints within 7 bits share at least one
+MAX_DISTANCE = 6                # differing bits for titles to count as the same item
+MIN_TOKENS = 3                  # shorter titles are too generic to cluster on
+MAX_CANDIDATES = 128            # most recent band matches compared per new item, split over the bands
+BAND_LOOKUPS = 64               # (band, value) pairs per query, well below SQLite's compound SELECT limit
+ID_LOOKUPS = 500                # ids per SELECT ... IN (...), below SQLite's variable limit
+PRICE_TOLERANCE = 0.15          # near-duplicates must also be priced within 15% of each other
+
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def canonical_url(url: str) -> str:
+    """One URL per listing: known listing ids where the site has them, tracking parameters stripped elsewhere"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for host_pattern, path_pattern, template in CANONICAL_RULES:
+        if re.search(host_pattern, host):
+            match = re.match(path_pattern, parts.path)
+            if match:
+                return template.format(*match.groups(), host=host)
+
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_'))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower() or 'https', host, path, urlencode(query), ''))
+
+
+def item_id(title: str, url: str) -> str:
+    """Stable id for a listing, the same wherever it was found"""
+    key = canonical_url(url) if url else title
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def title_tokens(title: str) -> List[str]:
+    text = unicodedata.normalize('NFKC', title).lower().translate(UMLAUTS)
+    text = re.sub(r'\b([a-z])\.(?=[a-z]\b)', r'\1', text)  # "c.p. company" -> "cp company"
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def title_numbers(title: str) -> List[str]:
+    """Sizes, years and model numbers: titles that differ in these are different items"""
+    return sorted(token for token in title_tokens(title) if token.isdigit())
+
+
+# The same few stored items are candidates for many new ones
+_cached_title_numbers = lru_cache(maxsize=4096)(title_numbers)
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def simhash(title: str) -> Optional[int]:
+    """64-bit SimHash of a title's character shingles, None for titles too short to compare"""
+    tokens = title_tokens(title)
+    if len(tokens) < MIN_TOKENS:
+        return None
+    text = ' '.join(tokens)
+    features = [text[i:i + SHINGLE] for i in range(max(1, len(text) - SHINGLE + 1))]
+    # Per-bit counts are kept bit-sliced: bit i of counts[k] is bit k of how many hashes have bit i set,
+    # so adding a hash is a ripple-carry add over all 64 counters at once
+    counts = []
+    for feature in features:
+        carry = _feature_hash(feature)
+        for k, count in enumerate(counts):
+            if not carry:
+                break
+            counts[k], carry = count ^ carry, count & carry
+        if carry:
+            counts.append(carry)
+    # A bit is set where most feature hashes have it set: compare every counter with half, high bits first
+    half = len(features) // 2
+    above, equal = 0, MASK
+    for k in range(max(len(counts), half.bit_length()) - 1, -1, -1):
+        count = counts[k] if k < len(counts) else 0
+        if half >> k & 1:
+            equal &= count
+        else:
+            above |= equal & count
+            equal &= ~count
+    return above
+
+
+def to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(fingerprint: int) -> List[Tuple[int, int]]:
+    width = SIMHASH_BITS // BANDS
+    return [(band, fingerprint >> (band * width) & ((1 << width) - 1)) for band in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & MASK).bit_count()
+
+
+def prices_match(a: Optional[int], b: Optional[int]) -> bool:
+    if a is None or b is None:
+        return True
+    return abs(a - b) <= PRICE_TOLERANCE * max(a, b)
+
+
+class ClusterIndex:
+    def __init__(self, conn):
+        """Banded SimHash index over the simhash_bands table of an open items database"""
+        self.conn = conn
+        # (simhash, cluster, title, price) of items assigned but not yet written to seen_items
+        self.pending = []
+
+    def _band_matches(self, pairs: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict[str, int]]:
+        """{item: unsigned simhash} of the most recent stored items in each (band, value), for all of `pairs` at once"""
+        # The most recent items of each band, in rowid order straight off the (band, value) index
+        per_band = f'SELECT * FROM (SELECT band, value, item_id, simhash FROM simhash_bands ' \
+                   f'WHERE band = ? AND value = ? ORDER BY rowid DESC LIMIT {MAX_CANDIDATES // BANDS})'
+        matches = {pair: {} for pair in pairs}
+        for start in range(0, len(pairs), BAND_LOOKUPS):
+            chunk = pairs[start:start + BAND_LOOKUPS]
+            values = [v for pair in chunk for v in pair]
+            for band, value, item_id, stored in self.conn.execute(' UNION ALL '.join([per_band] * len(chunk)), values):
+                matches[band, value][item_id] = stored & MASK
+        return matches
+
+    def _details(self, ids: List[str]) -> Dict[str, Tuple[str, str, Optional[int]]]:
+        """{id: (cluster, title, price)} of stored items"""
+        details = {}
+        for start in range(0, len(ids), ID_LOOKUPS):
+            chunk = ids[start:start + ID_LOOKUPS]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT id, cluster_id, title, price_base_cents FROM seen_items WHERE id IN ({placeholders})', chunk
+            )
+            details.update((item_id, rest) for item_id, *rest in rows)
+        return details
+
+    def _near_all(self, fingerprints: List[Optional[int]]) -> List[List[Tuple[int, str, str, Optional[int]]]]:
+        """For each fingerprint, (distance, cluster, title, price) of recent stored items within MAX_DISTANCE bits"""
+        fingerprint_bands = [bands(fingerprint) if fingerprint is not None else [] for fingerprint in fingerprints]
+        matches = self._band_matches(list(dict.fromkeys(pair for pairs in fingerprint_bands for pair in pairs)))
+        near = []
+        for fingerprint, pairs in zip(fingerprints, fingerprint_bands):
+            candidates = {}
+            for pair in pairs:
+                candidates.update(matches[pair])
+            near.append({item_id: distance for item_id, stored in candidates.items()
+                         if (distance := (fingerprint ^ stored).bit_count()) <= MAX_DISTANCE})
+        details = self._details(list(dict.fromkeys(item_id for distances in near for item_id in distances)))
+        return [[(d, *details[item_id]) for item_id, d in distances.items() if item_id in details]
+                for distances in near]
+
+    def _near(self, fingerprint: int) -> List[Tuple[int, str, str, Optional[int]]]:
+        """(distance, cluster, title, price) of recent stored items within MAX_DISTANCE bits"""
+        return self._near_all([fingerprint])[0]
+
+    def _closest(self, title: str, fingerprint: Optional[int], price_base_cents: Optional[int],
+                 near: List[Tuple[int, str, str, Optional[int]]]) -> Optional[str]:
+        """Cluster of the closest of the stored `near` items and the pending ones that is a near-duplicate"""
+        if fingerprint is None:
+            return None
+        candidates = near + [
+            ((fingerprint ^ stored).bit_count(), cluster_id, stored_title, stored_price)
+            for stored, cluster_id, stored_title, stored_price in self.pending
+        ]
+        numbers = None
+        best = None
+        for distance, cluster_id, stored_title, stored_price in candidates:
+            if (distance <= MAX_DISTANCE and (best is None or distance < best[0])
+                    and prices_match(price_base_cents, stored_price)):
+                # Title numbers are compared last, once distance and price have matched
+                numbers = numbers if numbers is not None else _cached_title_numbers(title)
+                if _cached_title_numbers(stored_title) == numbers:
+                    best = (distance, cluster_id)
+        return best[1] if best else None
+
+    def find_cluster(self, title: str, fingerprint: Optional[int], price_base_cents: Optional[int]) -> Optional[str]:
+        """Cluster of the closest stored near-duplicate, if there is one"""
+        if fingerprint is None:
+            return None
+        return self._closest(title, fingerprint, price_base_cents, self._near(fingerprint))
+
+    def written(self):
+        """The pending items are now in seen_items"""
+        self.pending.clear()
+
+    def add(self, item_id: str, fingerprint: Optional[int]):
+        self.add_all([(item_id, fingerprint)])
+
+    def add_all(self, entries: List[Tuple[str, Optional[int]]]):
+        """Index (item, fingerprint) pairs in one statement"""
+        self.conn.executemany('INSERT INTO simhash_bands (band, value, item_id, simhash) VALUES (?, ?, ?, ?)',
+                              [(band, value, item_id, to_signed(fingerprint))
+                               for item_id, fingerprint in entries if fingerprint is not None
+                               for band, value in bands(fingerprint)])
+
+    def assign(self, item_id: str, title: str, price_base_cents: Optional[int]) -> Tuple[Optional[int], str]:
+        """Fingerprint a new item and index it; returns (simhash as stored, cluster id)"""
+        return self.assign_all([(item_id, title, price_base_cents)])[0]
+
+    def assign_all(self, items: List[Tuple[str, str, Optional[int]]]) -> List[Tuple[Optional[int], str]]:
+        """Fingerprint new (item, title, price) entries in order and index them, looking up the
+        stored candidates of all of them at once; returns (simhash as stored, cluster id) for each
+
+        An item is compared with the stored candidates its bands had before
+        the batch and with the batch's earlier items, which are pending.
+        """
+        fingerprints = [simhash(title) for _, title, _ in items]
+        assigned = []
+        for (item_id, title, price_base_cents), fingerprint, near in zip(items, fingerprints, self._near_all(fingerprints)):
+            cluster_id = self._closest(title, fingerprint, price_base_cents, near) or item_id
+            if fingerprint is None:
+                assigned.append((None, cluster_id))
+                continue
+            self.pending.append((fingerprint, cluster_id, title, price_base_cents))
+            assigned.append((to_signed(fingerprint), cluster_id))
+        self.add_all([(item_id, fingerprint) for (item_id, _, _), fingerprint in zip(items, fingerprints)])
+        return assigned
+
+
+def rekey(rows: List[Tuple[str, str, str]]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """For (id, title, url) rows, oldest first: {old id: new id} for rows whose id changes,
+    and {duplicate id: id of the older row it duplicates}"""
+    renames, duplicates, kept = {}, {}, {}
+    for old_id, title, url in rows:
+        new_id = item_id(title, url)
+        if new_id in kept:
+            duplicates[old_id] = kept[new_id]
+            continue
+        kept[new_id] = old_id
+        if new_id != old_id:
+            renames[old_id] = new_id
+    return renames, duplicates
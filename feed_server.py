@@ -0,0 +1,269 @@
+"""
+Local feed server: the stored catalog as paginated JSON, and new listings pushed over Server-Sent Events
+
+The static site only changes after a scheduled run is committed and deployed.
+Served from here instead, the same pages get two extra endpoints:
+
+    GET /api/items     newest listings first, a page at a time
+    GET /api/events    a text/event-stream with one "listing" event per stored listing
+
+A watcher thread polls seen_items for rows inserted since its last look, by
+whichever process stores them (usually the daemon), and hands them to every
+connected browser, so a listing shows up seconds after it was scraped.
+"""
+import json
+import math
+import posixpath
+import queue
+import sqlite3
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from storage import ItemStore, match_query
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+POLL_SECONDS = 1.0          # how often the watcher looks for new listings
+KEEPALIVE_SECONDS = 15      # comment lines that keep proxies from closing an idle stream
+BACKLOG = 100               # undelivered batches before a slow subscriber is dropped
+
+FEED_COLUMNS = '''
+    s.rowid, s.id, s.title, s.url, s.price, s.price_base_cents, s.source, s.source_family,
+    s.image_url, s.found_date, s.cluster_id
+'''
+
+
+def is_site_file(path: str) -> bool:
+    """Only the page and its data are served; the site directory is usually the whole checkout"""
+    path = posixpath.normpath(unquote(urlsplit(path).path))
+    return path in ('/', '/index.html') or path.startswith('/data/')
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """A read-only connection; WAL lets it read while the scraper writes"""
+    return sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+
+
+def to_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def to_cents(value: str) -> int:
+    """A price parameter in cents; ValueError for anything but a number SQLite can compare"""
+    amount = float(value)
+    # Past SQLite's 64-bit integers the query itself would fail
+    if not math.isfinite(amount) or abs(amount * 100) >= 1 << 63:
+        raise ValueError(f'{value!r} is not a price')
+    return round(amount * 100)
+
+
+def list_items(conn: sqlite3.Connection, params: Dict[str, str]) -> Dict:
+    """A page of listings, newest first, after the `cursor` of the previous page
+
+    Pages are cut on (found_date, id), so listings stored while a client pages
+    through never shift it onto items it has already had.
+    """
+    limit = min(max(1, int(params.get('limit', PAGE_SIZE))), MAX_PAGE_SIZE)
+    joins, conditions, args = '', [], []
+    query = match_query(params.get('q', ''))
+    if query:
+        joins = 'JOIN items_fts ON items_fts.item_id = s.id'
+        conditions.append('items_fts MATCH ?')
+        args.append(query)
+    if params.get('source'):
+        conditions.append('(s.source = ? COLLATE NOCASE OR s.source_family = ? COLLATE NOCASE)')
+        args += [params['source'], params['source']]
+    if params.get('min_price'):
+        conditions.append('s.price_base_cents >= ?')
+        args.append(to_cents(params['min_price']))
+    if params.get('max_price'):
+        conditions.append('s.price_base_cents <= ?')
+        args.append(to_cents(params['max_price']))
+    if params.get('cursor'):
+        found_date, item_id = params['cursor'].rsplit('|', 1)
+        conditions.append('(s.found_date, s.id) < (?, ?)')
+        args += [found_date, item_id]
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    items = to_dicts(conn.execute(f'''
+        SELECT {FEED_COLUMNS} FROM seen_items s {joins} {where}
+        ORDER BY s.found_date DESC, s.id DESC LIMIT ?
+    ''', args + [limit + 1]))
+    more = len(items) > limit
+    items = items[:limit]
+    for item in items:
+        del item['rowid']
+    last = items[-1] if items else None
+    return {'items': items, 'next': f"{last['found_date']}|{last['id']}" if more else None}
+
+
+def encode_events(rows: List[Dict]) -> bytes:
+    """One "listing" event per row, with its rowid as the event id"""
+    events = []
+    for row in rows:
+        listing = {key: value for key, value in row.items() if key != 'rowid'}
+        events.append(f"id: {row['rowid']}\nevent: listing\ndata: {json.dumps(listing, ensure_ascii=False)}\n\n")
+    return ''.join(events).encode()
+
+
+class Subscription:
+    def __init__(self):
+        """Encoded batches of new listings for one connected client"""
+        self.queue = queue.Queue(BACKLOG)
+        # Set when the client fell too far behind; it reconnects and catches up with Last-Event-ID
+        self.dropped = False
+
+
+class ListingFeed:
+    def __init__(self, db_path: str, poll_seconds: float = POLL_SECONDS):
+        """Watch seen_items for inserted rows and hand them to every subscriber"""
+        self.db_path = db_path
+        self.poll_seconds = poll_seconds
+        self.conn = connect(db_path)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.last_rowid = self.conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM seen_items').fetchone()[0]
+        self.thread = threading.Thread(target=self._watch, name='listing-feed', daemon=True)
+        self.thread.start()
+
+    def since(self, rowid: int, until: Optional[int] = None) -> List[Dict]:
+        """Listings stored after `rowid` (up to `until`), oldest first"""
+        conn = connect(self.db_path)
+        try:
+            return to_dicts(conn.execute(f'''
+                SELECT {FEED_COLUMNS} FROM seen_items s WHERE s.rowid > ? AND s.rowid <= ? ORDER BY s.rowid
+            ''', (rowid, until if until is not None else 1 << 62)))
+        finally:
+            conn.close()
+
+    def _watch(self):
+        while not self.stopped.wait(self.poll_seconds):
+            try:
+                rows = to_dicts(self.conn.execute(f'''
+                    SELECT {FEED_COLUMNS} FROM seen_items s WHERE s.rowid > ? ORDER BY s.rowid
+                ''', (self.last_rowid,)))
+            except sqlite3.Error as e:
+                print(f"⚠ Listing feed could not read the database: {e}")
+                continue
+            if not rows:
+                continue
+            # Encoded once and shared by every subscriber, so nothing they do can change it
+            events = encode_events(rows)
+            with self.lock:
+                self.last_rowid = rows[-1]['rowid']
+                for subscription in list(self.subscribers):
+                    try:
+                        subscription.queue.put_nowait(events)
+                    except queue.Full:
+                        subscription.dropped = True
+                        self.subscribers.discard(subscription)
+
+    def subscribe(self) -> Tuple[Subscription, int]:
+        """A new subscription, and the last rowid before the listings it will be sent"""
+        subscription = Subscription()
+        with self.lock:
+            self.subscribers.add(subscription)
+            return subscription, self.last_rowid
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.conn.close()
+
+
+class FeedHandler(SimpleHTTPRequestHandler):
+    server: 'FeedServer'
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/api/items':
+            self.send_items({key: values[-1] for key, values in parse_qs(parts.query).items()})
+        elif parts.path == '/api/events':
+            self.send_events()
+        else:
+            super().do_GET()
+
+    def send_head(self):
+        # Behind GET and HEAD for files, so .git, config.json, .env and the database stay private
+        if not is_site_file(self.path):
+            self.send_error(404)
+            return None
+        return super().send_head()
+
+    def send_json(self, status: int, body: Dict):
+        content = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_items(self, params: Dict[str, str]):
+        conn = connect(self.server.db_path)
+        try:
+            page = list_items(conn, params)
+        except ValueError as e:
+            self.send_json(400, {'error': f'bad parameter: {e}'})
+            return
+        finally:
+            conn.close()
+        self.send_json(200, page)
+
+    def send_events(self):
+        feed = self.server.feed
+        subscription, watermark = feed.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(b'retry: 5000\n\n')
+            # A reconnecting browser first gets what it missed in between
+            last_event = self.headers.get('Last-Event-ID', '')
+            if last_event.isdigit() and int(last_event) < watermark:
+                self.wfile.write(encode_events(feed.since(int(last_event), watermark)))
+            self.wfile.flush()
+            while not feed.stopped.is_set():
+                try:
+                    self.wfile.write(subscription.queue.get(timeout=KEEPALIVE_SECONDS))
+                except queue.Empty:
+                    if subscription.dropped:
+                        return
+                    self.wfile.write(b': keepalive\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            feed.unsubscribe(subscription)
+
+    def log_request(self, code='-', size='-'):
+        # Every request would otherwise be logged; errors still are
+        pass
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, db_path: str, address: Tuple[str, int], site_dir: str = '.', currency: Optional[Dict] = None):
+        """Serve the site in `site_dir` plus the API over the items database at `db_path`;
+        `currency` is config.json's rate table, used if the schema needs migrating"""
+        # Bring the schema up to date first, so the read-only queries can rely on it
+        ItemStore(db_path, currency).close()
+        self.db_path = db_path
+        self.feed = ListingFeed(db_path)
+        super().__init__(address, partial(FeedHandler, directory=site_dir))
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        self.feed.close()
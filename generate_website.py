@@ -1,41 +1,34 @@
 #!/usr/bin/env python3
 """
-Generate static HTML website from database
+Generate static website from database
+
+index.html is a small page that loads the catalog from columnar JSON shards in
+data/, listed in data/manifest.json, and renders only the cards in view. Title
+search and the price sort come precomputed in data/index.json. Builds
+are incremental: a shard is only rendered again when its items changed, and a
+file is only written when its content did, so build time and the daily commit
+scale with what was found, not the catalog.
 """
+import argparse
+import bisect
+import hashlib
+import json
+import os
 import sqlite3
+from array import array
 from datetime import datetime
-import json
-
-def generate_website():
-    """Generate index.html from database"""
-
-    # Connect to database
-    conn = sqlite3.connect('seen_items.db')
-    cursor = conn.cursor()
-
-    # Get all items, sorted by date (newest first)
-    cursor.execute('''
-        SELECT id, title, url, price, source, found_date, image_url
-        FROM seen_items
-        ORDER BY found_date DESC
-    ''')
-
-    items = cursor.fetchall()
-    conn.close()
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 
-    # Count by source
-    source_counts = {}
-    for item in items:
-        source = item[4]
-        source_counts[source] = source_counts.get(source, 0) + 1
+import dedup
 
-    # Generate HTML
-    html = f"""<!DOCTYPE html>
+# Page fragments, prepared once and filled in with str.format
+PAGE_START = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Vintage Coat Finder - {len(items)} Items</title>
+    <title>Vintage Coat Finder - {total} Items</title>
     <style>
         * {{
             margin: 0;
@@ -43,6 +36,10 @@ def generate_website():
             box-sizing: border-box;
         }}
 
+        :root {{
+            --card-height: 560px;
+        }}
+
         body {{
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -104,6 +101,10 @@ def generate_website():
             min-width: 250px;
         }}
 
+        .price-box {{
+            width: 160px;
+        }}
+
         input, select {{
             padding: 12px 15px;
             border: 2px solid #e0e0e0;
@@ -118,7 +119,16 @@ def generate_website():
             border-color: #667eea;
         }}
 
+        /* Sized for every matching item; only the cards in view are in the grid inside it */
+        .viewport {{
+            position: relative;
+        }}
+
         .items-grid {{
+            position: absolute;
+            top: 0;
+            left: 0;
+            right: 0;
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(280px, 1fr));
             gap: 20px;
@@ -132,6 +142,7 @@ def generate_website():
             transition: transform 0.3s, box-shadow 0.3s;
             display: flex;
             flex-direction: column;
+            height: var(--card-height);
         }}
 
         .item-card:hover {{
@@ -170,6 +181,10 @@ def generate_website():
             color: #333;
             margin-bottom: 12px;
             line-height: 1.4;
+            display: -webkit-box;
+            -webkit-line-clamp: 2;
+            -webkit-box-orient: vertical;
+            overflow: hidden;
         }}
 
         .item-info {{
@@ -202,6 +217,21 @@ def generate_website():
             display: inline-block;
         }}
 
+        .new-badge {{
+            background: #e67e22;
+            color: white;
+            padding: 4px 10px;
+            border-radius: 15px;
+            font-size: 0.8em;
+            font-weight: 600;
+            display: inline-block;
+        }}
+
+        .also-on {{
+            color: #999;
+            font-size: 0.85em;
+        }}
+
         .date {{
             color: #999;
             font-size: 0.85em;
@@ -216,12 +246,41 @@ def generate_website():
             border-radius: 8px;
             font-weight: 600;
             transition: opacity 0.3s;
+            margin-top: auto;
+            text-align: center;
         }}
 
         .view-btn:hover {{
             opacity: 0.9;
         }}
 
+        .live {{
+            background: white;
+            padding: 20px;
+            border-radius: 15px;
+            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+            margin-bottom: 20px;
+        }}
+
+        .live h2 {{
+            font-size: 1.1em;
+            color: #333;
+            margin-bottom: 10px;
+        }}
+
+        .live ul {{
+            list-style: none;
+            display: flex;
+            flex-direction: column;
+            gap: 8px;
+        }}
+
+        .live a {{
+            color: #333;
+            font-weight: 600;
+            text-decoration: none;
+        }}
+
         .no-results {{
             text-align: center;
             padding: 60px 20px;
@@ -239,10 +298,6 @@ def generate_website():
         }}
 
         @media (max-width: 768px) {{
-            .items-grid {{
-                grid-template-columns: 1fr;
-            }}
-
             h1 {{
                 font-size: 1.8em;
             }}
@@ -255,30 +310,31 @@ def generate_website():
             <h1>🧥 Vintage Coat Finder</h1>
             <p style="color: #666; margin-top: 10px;">Your personal vintage coat catalog</p>
             <div class="stats">
-                <div class="stat"><strong>{len(items)}</strong> Total Items</div>
+                <div class="stat"><strong>{total}</strong> Total Items</div>
+                <div class="stat"><strong>{new_count}</strong> New This Run</div>
 """
 
-    # Add source counts
-    for source, count in sorted(source_counts.items(), key=lambda x: x[1], reverse=True):
-        html += f'                <div class="stat"><strong>{count}</strong> {source}</div>\n'
+SOURCE_STAT = '                <div class="stat"><strong>{count}</strong> {source}</div>\n'
 
-    html += f"""                <div class="stat">Updated: <strong>{datetime.now().strftime('%Y-%m-%d %H:%M UTC')}</strong></div>
+CONTROLS_START = """                <div class="stat">Updated: <strong>{updated}</strong></div>
             </div>
         </header>
 
         <div class="controls">
             <div class="search-box">
-                <input type="text" id="searchInput" placeholder="🔍 Search by title..." onkeyup="filterItems()">
+                <input type="text" id="searchInput" placeholder="🔍 Search by title..." oninput="filterItems()">
+            </div>
+            <div class="price-box">
+                <input type="number" id="maxPrice" placeholder="Max price" min="0" oninput="filterItems()">
             </div>
             <select id="sourceFilter" onchange="filterItems()">
                 <option value="all">All Sources</option>
 """
 
-    # Add source filter options
-    for source in sorted(source_counts.keys()):
-        html += f'                <option value="{source}">{source}</option>\n'
+SOURCE_OPTION = '                <option value="{source}">{source}</option>\n'
 
-    html += """            </select>
+# Not a format string: the script's braces are literal
+PAGE_END = """            </select>
             <select id="sortOrder" onchange="sortItems()">
                 <option value="newest">Newest First</option>
                 <option value="oldest">Oldest First</option>
@@ -287,54 +343,18 @@ def generate_website():
             </select>
         </div>
 
-        <div class="items-grid" id="itemsContainer">
-"""
-
-    # Add items
-    for item in items:
-        item_id, title, url, price, source, found_date, image_url = item
-
-        # Parse date
-        try:
-            date_obj = datetime.fromisoformat(found_date)
-            date_str = date_obj.strftime('%b %d, %Y')
-        except:
-            date_str = found_date[:10] if found_date else 'Unknown'
-
-        # Escape HTML
-        title_escaped = title.replace('"', '&quot;').replace('<', '&lt;').replace('>', '&gt;')
-        url_escaped = url.replace('"', '&quot;')
-        image_url_escaped = image_url.replace('"', '&quot;') if image_url else ''
-
-        # Generate image HTML
-        if image_url:
-            image_html = f'<img src="{image_url_escaped}" alt="{title_escaped}" class="item-image" loading="lazy">'
-        else:
-            image_html = '<div class="item-image-placeholder">🧥</div>'
-
-        html += f"""            <div class="item-card" data-source="{source}" data-price="{price}" data-date="{found_date}" data-title="{title.lower()}">
-                {image_html}
-                <div class="item-content">
-                    <div class="item-title">{title_escaped}</div>
-                    <div class="item-info">
-                        <div>
-                            <span class="price">{price}</span>
-                        </div>
-                        <div>
-                            <span class="source">{source}</span>
-                        </div>
-                        <div class="date">Found: {date_str}</div>
-                    </div>
-                    <a href="{url_escaped}" target="_blank" class="view-btn">View Item →</a>
-                </div>
-            </div>
-"""
+        <div class="live" id="live" hidden>
+            <h2>⚡ Just listed</h2>
+            <ul id="liveList"></ul>
+        </div>
 
-    html += """        </div>
+        <div class="viewport" id="viewport">
+            <div class="items-grid" id="itemsContainer"></div>
+        </div>
 
-        <div class="no-results" id="noResults" style="display: none;">
-            <h2>No items found</h2>
-            <p>Try adjusting your search or filters</p>
+        <div class="no-results" id="noResults">
+            <h2>Loading items…</h2>
+            <noscript><p>The catalog needs JavaScript</p></noscript>
         </div>
 
         <div class="footer">
@@ -346,61 +366,523 @@ def generate_website():
     </div>
 
     <script>
-        function filterItems() {
-            const searchTerm = document.getElementById('searchInput').value.toLowerCase();
-            const sourceFilter = document.getElementById('sourceFilter').value;
-            const items = document.querySelectorAll('.item-card');
-            let visibleCount = 0;
+        const CARD_GAP = 20;
+        const MIN_CARD_WIDTH = 280;
+        const OVERSCAN_ROWS = 2;
+        const LIVE_ITEMS = 20;
+
+        // One array per field, indexed by item, oldest item first
+        const catalog = {title: [], url: [], image: [], price: [], cents: [], source: [], date: [], isNew: [], alsoOn: []};
+        // Title tokens with the items containing them, and item indices by price (see render_search_index)
+        let searchIndex = null;
+        let priceRank = null;
+        const decodedPostings = new Map();
+        const orders = {};
+        let view = [];
+        let columns = 1;
+        let rowHeight = 0;
+        let rendered = [-1, -1];
+
+        // The same tokens as dedup.title_tokens() on the server
+        function queryTokens(text) {
+            return text.normalize('NFKC').toLowerCase()
+                .replace(/ä/g, 'ae').replace(/ö/g, 'oe').replace(/ü/g, 'ue').replace(/ß/g, 'ss')
+                .replace(/\\b([a-z])\\.(?=[a-z]\\b)/g, '$1')
+                .match(/[a-z0-9]+/g) || [];
+        }
 
-            items.forEach(item => {
-                const title = item.getAttribute('data-title');
-                const source = item.getAttribute('data-source');
+        function escapeHtml(text) {
+            return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+        }
 
-                const matchesSearch = title.includes(searchTerm);
-                const matchesSource = sourceFilter === 'all' || source === sourceFilter;
+        async function loadCatalog() {
+            const manifest = await (await fetch('data/manifest.json', {cache: 'no-cache'})).json();
+            // Shard URLs change with their content, so unchanged shards come from the browser cache
+            const load = file => fetch(`${file.file}?v=${file.sha256.slice(0, 12)}`).then(response => response.json());
+            const [index, ...shards] = await Promise.all([load(manifest.index), ...manifest.shards.map(load)]);
+            searchIndex = index;
+            priceRank = new Int32Array(index.price.length);
+            index.price.forEach((item, rank) => { priceRank[item] = rank; });
+            for (const shard of shards) {
+                for (let i = 0; i < shard.title.length; i++) {
+                    catalog.title.push(shard.title[i]);
+                    catalog.url.push(shard.url[i]);
+                    catalog.image.push(shard.image[i]);
+                    catalog.price.push(shard.price[i]);
+                    catalog.cents.push(shard.cents[i]);
+                    catalog.source.push(shard.sources[shard.source[i]]);
+                    catalog.date.push(shard.date[i]);
+                    catalog.isNew.push(shard.new[i]);
+                    catalog.alsoOn.push(shard.also_on[i]);
+                }
+            }
+            layout();
+            filterItems();
+        }
 
-                if (matchesSearch && matchesSource) {
-                    item.style.display = 'block';
-                    visibleCount++;
+        // Item indices in the chosen order: items are stored oldest first, and the build ships
+        // the price order with unknown prices last
+        function sortedOrder(sortOrder) {
+            if (!orders[sortOrder]) {
+                const priced = searchIndex.priced;
+                if (sortOrder === 'oldest') {
+                    orders[sortOrder] = Array.from(catalog.title.keys());
+                } else if (sortOrder === 'newest') {
+                    orders[sortOrder] = Array.from(catalog.title.keys()).reverse();
+                } else if (sortOrder === 'price-low') {
+                    orders[sortOrder] = searchIndex.price;
                 } else {
-                    item.style.display = 'none';
+                    orders[sortOrder] = searchIndex.price.slice(0, priced).reverse().concat(searchIndex.price.slice(priced));
                 }
-            });
+            }
+            return orders[sortOrder];
+        }
 
-            document.getElementById('noResults').style.display = visibleCount === 0 ? 'block' : 'none';
+        // Items containing a token, ascending; the index stores the gaps between them
+        function postings(tokenNumber) {
+            if (!decodedPostings.has(tokenNumber)) {
+                const gaps = searchIndex.postings[tokenNumber];
+                const items = new Int32Array(gaps.length);
+                let item = 0;
+                gaps.forEach((gap, n) => { item += gap; items[n] = item; });
+                decodedPostings.set(tokenNumber, items);
+            }
+            return decodedPostings.get(tokenNumber);
         }
 
-        function sortItems() {
-            const container = document.getElementById('itemsContainer');
-            const items = Array.from(container.querySelectorAll('.item-card'));
+        // Number of the first token not sorting before `word`
+        function lowerBound(word) {
+            const tokens = searchIndex.tokens;
+            let low = 0, high = tokens.length;
+            while (low < high) {
+                const middle = (low + high) >> 1;
+                if (tokens[middle] < word) low = middle + 1; else high = middle;
+            }
+            return low;
+        }
+
+        function exactPostings(word) {
+            const n = lowerBound(word);
+            return searchIndex.tokens[n] === word ? postings(n) : new Int32Array(0);
+        }
+
+        // Items with a token starting with `prefix`, so results update while a word is typed
+        function prefixPostings(prefix) {
+            const tokens = searchIndex.tokens;
+            const lists = [];
+            for (let n = lowerBound(prefix); n < tokens.length && tokens[n].startsWith(prefix); n++) {
+                lists.push(postings(n));
+            }
+            if (lists.length <= 1) {
+                return lists[0] || new Int32Array(0);
+            }
+            const merged = new Int32Array(lists.reduce((length, list) => length + list.length, 0));
+            let offset = 0;
+            for (const list of lists) {
+                merged.set(list, offset);
+                offset += list.length;
+            }
+            merged.sort();
+            return merged.filter((item, n) => n === 0 || item !== merged[n - 1]);
+        }
+
+        function intersect(a, b) {
+            const result = [];
+            for (let i = 0, j = 0; i < a.length && j < b.length;) {
+                if (a[i] < b[j]) i++;
+                else if (a[i] > b[j]) j++;
+                else { result.push(a[i]); i++; j++; }
+            }
+            return result;
+        }
+
+        // Items whose title has every word, the last one as a prefix, ascending; null without words
+        function matchingItems(text) {
+            const words = queryTokens(text);
+            if (words.length === 0) {
+                return null;
+            }
+            const lists = words.map((word, n) => n === words.length - 1 ? prefixPostings(word) : exactPostings(word));
+            lists.sort((a, b) => a.length - b.length);
+            return lists.slice(1).reduce(intersect, Array.from(lists[0]));
+        }
+
+        // Search matches in the chosen order, without going through the whole catalog
+        function orderMatches(matches, sortOrder) {
+            if (sortOrder === 'oldest') {
+                return matches;
+            } else if (sortOrder === 'newest') {
+                return matches.reverse();
+            }
+            const priced = searchIndex.priced;
+            const key = sortOrder === 'price-low'
+                ? item => priceRank[item]
+                : item => priceRank[item] < priced ? priced - 1 - priceRank[item] : priceRank[item];
+            return matches.sort((a, b) => key(a) - key(b));
+        }
+
+        function filterItems() {
             const sortOrder = document.getElementById('sortOrder').value;
+            const sourceFilter = document.getElementById('sourceFilter').value;
+            // Prices are cents in the base currency, null when unknown
+            const maxPrice = parseFloat(document.getElementById('maxPrice').value) * 100;
+
+            const matches = matchingItems(document.getElementById('searchInput').value);
+            const candidates = matches === null ? sortedOrder(sortOrder) : orderMatches(matches, sortOrder);
+            view = sourceFilter === 'all' && isNaN(maxPrice) ? candidates : candidates.filter(i =>
+                (sourceFilter === 'all' || catalog.source[i] === sourceFilter)
+                && (isNaN(maxPrice) || (catalog.cents[i] !== null && catalog.cents[i] <= maxPrice)));
+
+            const noResults = document.getElementById('noResults');
+            noResults.innerHTML = '<h2>No items found</h2><p>Try adjusting your search or filters</p>';
+            noResults.style.display = view.length === 0 ? 'block' : 'none';
+            window.scrollTo(0, Math.min(window.scrollY, document.getElementById('viewport').offsetTop));
+            renderWindow(true);
+        }
+
+        function sortItems() {
+            filterItems();
+        }
+
+        function layout() {
+            const grid = document.getElementById('itemsContainer');
+            const width = document.getElementById('viewport').clientWidth;
+            columns = window.matchMedia('(max-width: 768px)').matches
+                ? 1 : Math.max(1, Math.floor((width + CARD_GAP) / (MIN_CARD_WIDTH + CARD_GAP)));
+            grid.style.gridTemplateColumns = `repeat(${columns}, 1fr)`;
+            rowHeight = parseFloat(getComputedStyle(document.documentElement).getPropertyValue('--card-height')) + CARD_GAP;
+        }
 
-            items.sort((a, b) => {
-                if (sortOrder === 'newest') {
-                    return b.getAttribute('data-date').localeCompare(a.getAttribute('data-date'));
-                } else if (sortOrder === 'oldest') {
-                    return a.getAttribute('data-date').localeCompare(b.getAttribute('data-date'));
-                } else if (sortOrder === 'price-low' || sortOrder === 'price-high') {
-                    const priceA = parseFloat(a.getAttribute('data-price').replace(/[^0-9.]/g, '')) || 0;
-                    const priceB = parseFloat(b.getAttribute('data-price').replace(/[^0-9.]/g, '')) || 0;
-                    return sortOrder === 'price-low' ? priceA - priceB : priceB - priceA;
+        function renderCard(i) {
+            const title = escapeHtml(catalog.title[i]);
+            const image = catalog.image[i]
+                ? `<img src="${escapeHtml(catalog.image[i])}" alt="${title}" class="item-image" loading="lazy">`
+                : '<div class="item-image-placeholder">🧥</div>';
+            return `<div class="item-card">
+                ${image}
+                <div class="item-content">
+                    <div class="item-title" title="${title}">${title}</div>
+                    <div class="item-info">
+                        <div><span class="price">${escapeHtml(catalog.price[i])}</span></div>
+                        <div><span class="source">${escapeHtml(catalog.source[i])}</span>${catalog.isNew[i] ? ' <span class="new-badge">New</span>' : ''}</div>
+                        ${catalog.alsoOn[i] ? `<div class="also-on">Also on: ${escapeHtml(catalog.alsoOn[i])}</div>` : ''}
+                        <div class="date">Found: ${catalog.date[i]}</div>
+                    </div>
+                    <a href="${escapeHtml(catalog.url[i])}" target="_blank" class="view-btn">View Item →</a>
+                </div>
+            </div>`;
+        }
+
+        // Put the rows of cards in view (plus a few either side) into the grid
+        function renderWindow(force) {
+            const viewport = document.getElementById('viewport');
+            const grid = document.getElementById('itemsContainer');
+            const rows = Math.ceil(view.length / columns);
+            viewport.style.height = rows ? `${rows * rowHeight - CARD_GAP}px` : '0';
+
+            const top = viewport.getBoundingClientRect().top;
+            const first = Math.max(0, Math.floor(-top / rowHeight) - OVERSCAN_ROWS);
+            const last = Math.min(rows, Math.ceil((window.innerHeight - top) / rowHeight) + OVERSCAN_ROWS);
+            if (!force && first === rendered[0] && last === rendered[1]) {
+                return;
+            }
+            rendered = [first, last];
+            grid.style.transform = `translateY(${first * rowHeight}px)`;
+            grid.innerHTML = view.slice(first * columns, last * columns).map(renderCard).join('');
+        }
+
+        let frameRequested = false;
+        window.addEventListener('scroll', () => {
+            if (!frameRequested) {
+                frameRequested = true;
+                requestAnimationFrame(() => {
+                    frameRequested = false;
+                    renderWindow(false);
+                });
+            }
+        }, {passive: true});
+        window.addEventListener('resize', () => {
+            layout();
+            renderWindow(true);
+        });
+
+        // Served by feed_server.py, listings also arrive as the scraper stores them; the static
+        // site has no such endpoint and the stream simply fails to open
+        function followLive() {
+            if (!window.EventSource || location.protocol === 'file:') {
+                return;
+            }
+            const events = new EventSource('api/events');
+            events.addEventListener('listing', event => {
+                const item = JSON.parse(event.data);
+                const list = document.getElementById('liveList');
+                const entry = document.createElement('li');
+                entry.innerHTML = `<a href="${escapeHtml(item.url)}" target="_blank">${escapeHtml(item.title)}</a>
+                    <span class="price">${escapeHtml(item.price || '')}</span>
+                    <span class="source">${escapeHtml(item.source)}</span>`;
+                list.prepend(entry);
+                while (list.children.length > LIVE_ITEMS) {
+                    list.lastElementChild.remove();
                 }
+                document.getElementById('live').hidden = false;
+                // The grid lives below the strip, so its window moves with it
+                renderWindow(true);
             });
-
-            items.forEach(item => container.appendChild(item));
         }
+
+        loadCatalog();
+        followLive();
     </script>
 </body>
 </html>
 """
 
-    # Write to file
-    with open('index.html', 'w', encoding='utf-8') as f:
-        f.write(html)
-
-    print(f"✓ Generated website with {len(items)} items")
+# Items per data shard; shards are cut oldest first and never move once cut
+SHARD_SIZE = 1000
+DATA_DIR = 'data'
+MANIFEST_VERSION = 3
+
+# One card per cluster of duplicates, shown as its first-found listing
+REPRESENTATIVE = 's.cluster_id = s.id OR s.cluster_id IS NULL'
+
+# Item fields; the parameter is the latest run, whose items are flagged as new
+ITEM_COLUMNS = '''
+    s.title, s.url, s.price, s.source, s.found_date, s.image_url, s.price_base_cents,
+    COALESCE(s.first_seen_run = ?, 0),
+    (SELECT GROUP_CONCAT(DISTINCT o.source) FROM seen_items o
+     WHERE o.cluster_id = s.id AND o.id != s.id AND o.source != s.source)
+'''
+
+
+@lru_cache(maxsize=4096)
+def format_date(found_date: Optional[str]) -> str:
+    """"Jan 01, 2026"; items found in one batch share a timestamp, so most calls hit the cache"""
+    try:
+        return datetime.fromisoformat(found_date).strftime('%b %d, %Y')
+    except (TypeError, ValueError):
+        return found_date[:10] if found_date else 'Unknown'
+
+
+def render_shard(rows: List[Tuple]) -> str:
+    """Compact columnar JSON for a shard's items: one array per field, sources numbered"""
+    columns = {'title': [], 'url': [], 'image': [], 'price': [], 'cents': [], 'source': [],
+               'date': [], 'new': [], 'also_on': []}
+    sources = {}
+    for title, url, price, source, found_date, image_url, price_base_cents, is_new, also_on in rows:
+        columns['title'].append(title)
+        columns['url'].append(url)
+        columns['image'].append(image_url or '')
+        columns['price'].append(price or '')
+        columns['cents'].append(price_base_cents)
+        columns['source'].append(sources.setdefault(source, len(sources)))
+        columns['date'].append(format_date(found_date))
+        columns['new'].append(is_new)
+        columns['also_on'].append(also_on.replace(',', ', ') if also_on else '')
+    columns['sources'] = list(sources)
+    return json.dumps(columns, ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_gaps(items: array) -> str:
+    """JSON list of the first item number and the gaps to each next one"""
+    return '[' + ','.join(map(str, [items[0], *map(int.__sub__, items[1:], items)])) + ']'
+
+
+def render_search_index(conn: sqlite3.Connection) -> str:
+    """Title tokens with the items containing them, and the price sort order, as JSON
+
+    Items are numbered by position across the shards, oldest first. Each token's item
+    numbers are stored as gaps from the previous one, which keeps common tokens short.
+    """
+    postings: Dict[str, array] = {}
+    cents = []
+    rows = conn.execute(f'''
+        SELECT s.title, s.price_base_cents FROM seen_items s
+        WHERE {REPRESENTATIVE}
+        ORDER BY s.found_date, s.id
+    ''')
+    for item, (title, price_base_cents) in enumerate(rows):
+        for token in set(dedup.title_tokens(title)):
+            postings.setdefault(token, array('I')).append(item)
+        cents.append(price_base_cents)
+
+    tokens = sorted(postings)
+    # Encoded token by token: a string per token is far smaller than lists of ints
+    gaps = [encode_gaps(postings.pop(token)) for token in tokens]
+    # Cheapest first, ties oldest first; unknown prices go last whichever way the page sorts
+    priced = sorted((item for item, value in enumerate(cents) if value is not None), key=cents.__getitem__)
+    unpriced = [item for item, value in enumerate(cents) if value is None]
+    return (f'{{"tokens":{json.dumps(tokens)},"postings":[{",".join(gaps)}],'
+            f'"price":{json.dumps(priced + unpriced, separators=(",", ":"))},"priced":{len(priced)}}}')
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def write_if_changed(path: str, content: str, known_hash: Optional[str] = None) -> Tuple[str, bool]:
+    """Write `content` unless the file already holds it; returns (sha256, whether it was written)
+
+    `known_hash` is the file's hash from the manifest; without one the file is read and hashed.
+    """
+    data = content.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    if known_hash is None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            known_hash = hashlib.sha256(f.read()).hexdigest()
+    if digest == known_hash and os.path.exists(path):
+        return digest, False
+    # Written next to the file and moved into place, so a failed build never leaves half a file
+    partial_path = path + '.partial'
+    with open(partial_path, 'wb') as f:
+        f.write(data)
+    os.replace(partial_path, path)
+    return digest, True
+
+
+def shard_boundaries(conn: sqlite3.Connection, boundaries: List[Tuple[str, str]], shard_size: int) -> List[Tuple[str, str]]:
+    """Extend (found_date, id) keys of each shard's oldest item until the last shard holds at most shard_size items
+
+    Shards never move once cut: new items are found later than everything stored, so they
+    only ever land in the last shard, which is split when it fills up.
+    """
+    boundaries = list(boundaries)
+    while True:
+        start = boundaries[-1] if boundaries else ('', '')
+        row = conn.execute(f'''
+            SELECT s.found_date, s.id FROM seen_items s
+            WHERE ({REPRESENTATIVE}) AND (s.found_date, s.id) >= (?, ?)
+            ORDER BY s.found_date, s.id LIMIT 1 OFFSET ?
+        ''', (*start, shard_size if boundaries else 0)).fetchone()
+        if row is None:
+            return boundaries
+        boundaries.append(tuple(row))
+
+
+def changed_shards(conn: sqlite3.Connection, boundaries: List[Tuple[str, str]], since_run: int) -> Set[int]:
+    """Shards with an item that may have changed since the given run was built
+
+    Observations from that run on cover new items, items losing their "New" badge and price
+    changes; the representatives of new items' clusters gain an "Also on" source.
+    """
+    rows = conn.execute(f'''
+        SELECT s.found_date, s.id FROM seen_items s
+        WHERE ({REPRESENTATIVE}) AND s.id IN (
+            SELECT o.item_id FROM observations o WHERE o.run_id >= ?
+            UNION
+            SELECT c.cluster_id FROM observations o JOIN seen_items c ON c.id = o.item_id WHERE o.run_id >= ?
+        )
+    ''', (since_run, since_run))
+    return {max(bisect.bisect_right(boundaries, tuple(key)) - 1, 0) for key in rows}
+
+
+def shard_rows(conn: sqlite3.Connection, boundaries: List[Tuple[str, str]], shard: int, latest_run: int) -> List[Tuple]:
+    """Item rows of one shard, oldest first"""
+    conditions, params = [f'({REPRESENTATIVE})', '(s.found_date, s.id) >= (?, ?)'], [latest_run, *boundaries[shard]]
+    if shard + 1 < len(boundaries):
+        conditions.append('(s.found_date, s.id) < (?, ?)')
+        params += boundaries[shard + 1]
+    return conn.execute(f'''
+        SELECT {ITEM_COLUMNS} FROM seen_items s
+        WHERE {' AND '.join(conditions)}
+        ORDER BY s.found_date, s.id
+    ''', params).fetchall()
+
+
+def generate_website(db_path: str = 'seen_items.db', output_path: str = 'index.html',
+                     now: Optional[datetime] = None, shard_size: int = SHARD_SIZE, full: bool = False):
+    """Generate index.html and the catalog data shards from the database
+
+    Only shards whose items changed since the last build are rendered again, and files
+    are only written when their content changed; `full` rebuilds everything.
+    """
+
+    # A fixed `now` makes the output reproducible, e.g. after a --replay run
+    now = now or datetime.now()
+
+    data_dir = os.path.join(os.path.dirname(output_path), DATA_DIR)
+    manifest_path = os.path.join(data_dir, 'manifest.json')
+    os.makedirs(data_dir, exist_ok=True)
+    manifest = None if full else load_manifest(manifest_path)
+    if manifest and manifest['shard_size'] != shard_size:
+        manifest = None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        latest_run = conn.execute('SELECT MAX(id) FROM runs').fetchone()[0]
+        known = {shard['file']: shard['sha256'] for shard in manifest['shards']} if manifest else {}
+        boundaries = [tuple(shard['first']) for shard in manifest['shards']] if manifest else []
+        built = len(boundaries)
+        boundaries = shard_boundaries(conn, boundaries, shard_size)
+
+        if manifest and manifest['run_id'] is not None:
+            dirty = changed_shards(conn, boundaries, manifest['run_id'])
+            # Shards cut since the last build
+            dirty.update(range(built, len(boundaries)))
+        else:
+            dirty = set(range(len(boundaries)))
+
+        shards, written = [], 0
+        for shard, first in enumerate(boundaries):
+            name = f'{DATA_DIR}/{shard + 1}.json'
+            digest = known.get(name)
+            if shard in dirty:
+                data = render_shard(shard_rows(conn, boundaries, shard, latest_run))
+                digest, changed = write_if_changed(os.path.join(data_dir, f'{shard + 1}.json'), data, digest)
+                written += changed
+            shards.append({'file': name, 'first': list(first), 'sha256': digest})
+        # Built from the same titles and prices as the shards, so it only changes when one of them did
+        index_path = os.path.join(data_dir, 'index.json')
+        index = manifest['index'] if manifest and not written and len(boundaries) == built else None
+        if index is None or not os.path.exists(index_path):
+            digest, changed = write_if_changed(index_path, render_search_index(conn))
+            index = {'file': f'{DATA_DIR}/index.json', 'sha256': digest}
+            written += changed
+
+        # Shards left over from a build with a different shard size
+        for shard in manifest['shards'][len(shards):] if manifest else []:
+            stale = os.path.join(os.path.dirname(output_path), shard['file'])
+            if os.path.exists(stale):
+                os.remove(stale)
+
+        # Count by source, most items first
+        source_counts = dict(conn.execute(f'''
+            SELECT s.source, COUNT(*) FROM seen_items s
+            WHERE {REPRESENTATIVE}
+            GROUP BY s.source
+            ORDER BY COUNT(*) DESC, s.source
+        ''').fetchall())
+        total = sum(source_counts.values())
+        new_count = conn.execute(f'SELECT COUNT(*) FROM new_this_run s WHERE {REPRESENTATIVE}').fetchone()[0]
+    finally:
+        conn.close()
+
+    manifest = {'version': MANIFEST_VERSION, 'shard_size': shard_size, 'run_id': latest_run,
+                'index': index, 'shards': shards}
+    written += write_if_changed(manifest_path, json.dumps(manifest, indent=1) + '\n')[1]
+
+    parts = [PAGE_START.format(total=total, new_count=new_count)]
+    parts += [SOURCE_STAT.format(count=count, source=source) for source, count in source_counts.items()]
+    parts.append(CONTROLS_START.format(updated=now.strftime('%Y-%m-%d %H:%M UTC')))
+    parts += [SOURCE_OPTION.format(source=source) for source in sorted(source_counts)]
+    parts.append(PAGE_END)
+    written += write_if_changed(output_path, ''.join(parts))[1]
+
+    print(f"✓ Generated website with {total} items")
     print(f"  Sources: {', '.join(f'{k} ({v})' for k, v in source_counts.items())}")
+    print(f"  Rendered {len(dirty)} of {len(shards)} data shards, {written} files changed")
 
 
 if __name__ == '__main__':
-    generate_website()
+    parser = argparse.ArgumentParser(description='Generate the static catalog page and its data')
+    parser.add_argument('--db', default='seen_items.db', help='path to the items database')
+    parser.add_argument('--output', default='index.html', help='where to write the page')
+    parser.add_argument('--now', type=datetime.fromisoformat, help='timestamp to show as "Updated" (ISO format)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='items per data shard')
+    parser.add_argument('--full', action='store_true', help='render every shard, not just those with changes')
+    args = parser.parse_args()
+    generate_website(args.db, args.output, args.now, args.shard_size, args.full)
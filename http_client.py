@@ -0,0 +1,117 @@
+"""
+Shared HTTP client with one keep-alive connection pool per host
+"""
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import RateLimiter, parse_retry_after
+from response_cache import ResponseCache
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Status codes worth another attempt; any other error status fails at once
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    def __init__(self, config: Optional[Dict] = None, limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None):
+        """Initialize the client from the "http" section of config.json"""
+        config = config or {}
+        self.limiter = limiter or RateLimiter()
+        self.cache = cache
+        # Set by --record / --replay, see replay.py
+        self.recorder = None
+        self.replayer = None
+        self.pool_maxsize = config.get('pool_maxsize', 4)
+        self.max_retries = config.get('max_retries', 3)
+        self.timeout = config.get('timeout', 15)
+        self.headers = dict(DEFAULT_HEADERS, **config.get('headers', {}))
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.cache_hits = 0
+
+    def session_for(self, host: str) -> requests.Session:
+        """Get the pooled session for a host, creating it on first use"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            timeout: Optional[float] = None, max_retries: Optional[int] = None) -> Optional[requests.Response]:
+        """GET a URL with retry logic, returning None if every attempt fails"""
+        if self.replayer:
+            return self.replayer.fetch(url, params)
+
+        entry = self.cache.lookup(url, params) if self.cache else None
+        if entry and entry['fresh']:
+            with self._lock:
+                self.cache_hits += 1
+            return self.cache.to_response(entry)
+        if entry:
+            headers = dict(headers or {}, **self.cache.validators(entry))
+
+        host = urlsplit(url).netloc
+        session = self.session_for(host)
+        max_retries = max_retries or self.max_retries
+
+        for attempt in range(max_retries):
+            self.limiter.acquire(host)
+            try:
+                with self._lock:
+                    self.request_count += 1
+                response = session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+                if self.recorder:
+                    self.recorder.record(url, params, response)
+                response.raise_for_status()
+                if self.cache:
+                    if entry and response.status_code == 304:
+                        self.cache.refresh(entry)
+                        return self.cache.to_response(entry)
+                    if response.status_code == 200:
+                        self.cache.store(url, params, response)
+                return response
+            except requests.RequestException as e:
+                print(f"Request attempt {attempt + 1} failed: {e}")
+                status = e.response.status_code if e.response is not None else None
+                if status is not None and status not in RETRY_STATUSES:
+                    return None
+                if attempt < max_retries - 1:
+                    retry_after = parse_retry_after(e.response.headers.get('Retry-After')) if status else None
+                    if status == 429 or retry_after is not None:
+                        # The host asked us to slow down, so hold back every request to it
+                        self.limiter.defer(host, retry_after if retry_after is not None else 2 ** attempt)
+                    else:
+                        time.sleep(2 ** attempt)  # Exponential backoff
+                else:
+                    print(f"Failed to fetch {url} after {max_retries} attempts")
+        return None
+
+    def close(self):
+        """Close every pooled connection and the cache"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        if self.cache:
+            self.cache.close()
@@ -0,0 +1,179 @@
+"""
+Email digests of new listings, sent from a background thread over one reused SMTP connection
+
+After every run the finder hands the run over to the notifier and carries on.
+The notifier collects the items each recipient hasn't been sent yet, filters
+them by the recipient's sources and budget, and mails them as one digest. A
+ledger table records what went to whom, so an item is never sent twice and a
+digest that failed to send is retried after the next run.
+"""
+import html
+import os
+import queue
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Optional
+
+from storage import ItemStore
+
+# Ends the worker thread
+STOP = object()
+
+
+def load_recipients(settings: Dict) -> List[Dict]:
+    """Recipients from RECIPIENT_EMAIL (comma separated) plus those configured with filters"""
+    recipients = [{'email': email.strip()} for email in os.environ.get('RECIPIENT_EMAIL', '').split(',')
+                  if email.strip()]
+    recipients += settings.get('recipients', [])
+    return recipients
+
+
+def wanted(recipient: Dict, item: Dict) -> bool:
+    """Whether an item passes a recipient's source and price filters"""
+    sources = recipient.get('sources')
+    if sources and item['source_family'] not in sources:
+        return False
+    max_price = recipient.get('max_price')
+    price = item['price_base_cents']
+    return max_price is None or price is None or price <= max_price * 100
+
+
+def render_digest(sender: str, recipient: str, items: List[Dict], max_items: int, now: datetime) -> EmailMessage:
+    """One email listing `items`, as plain text and HTML"""
+    shown = items[:max_items]
+    more = len(items) - len(shown)
+    message = EmailMessage()
+    message['Subject'] = f"🧥 {len(items)} new vintage coat{'s' if len(items) != 1 else ''} found"
+    message['From'] = sender
+    message['To'] = recipient
+
+    lines = [f"{item['title']} - {item['price'] or 'no price'} ({item['source']})\n{item['url']}" for item in shown]
+    if more:
+        lines.append(f"... and {more} more on the website")
+    lines.append(f"Search run at {now:%Y-%m-%d %H:%M}")
+    message.set_content('\n\n'.join(lines))
+
+    rows = ''.join(
+        f'<tr><td style="padding:8px 0"><a href="{html.escape(item["url"])}">{html.escape(item["title"])}</a><br>'
+        f'<strong>{html.escape(item["price"] or "no price")}</strong> · {html.escape(item["source"])}</td></tr>'
+        for item in shown
+    )
+    footer = f'<p>... and {more} more on the website</p>' if more else ''
+    message.add_alternative(
+        f'<html><body><h2>{len(items)} new vintage coats</h2><table>{rows}</table>{footer}'
+        f'<p style="color:#999">Search run at {now:%Y-%m-%d %H:%M}</p></body></html>',
+        subtype='html'
+    )
+    return message
+
+
+class SmtpPool:
+    def __init__(self, settings: Dict, user: str, password: str):
+        """One SMTP connection, opened on first use and kept for every later message"""
+        self.host = settings.get('smtp_host', 'smtp.gmail.com')
+        self.port = settings.get('smtp_port', 587)
+        self.security = settings.get('security', 'starttls')  # 'starttls', 'ssl' or 'none'
+        self.timeout = settings.get('timeout', 30)
+        self.user = user
+        self.password = password
+        self.conn = None
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.security == 'ssl':
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                conn.starttls()
+        if self.password:
+            conn.login(self.user, self.password)
+        return conn
+
+    def send(self, message: EmailMessage):
+        # Servers drop idle connections, so a stale one is replaced once before giving up
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = self._connect()
+            try:
+                self.conn.send_message(message)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.conn = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.conn = None
+
+
+class Notifier:
+    def __init__(self, store: ItemStore, settings: Dict, sender: str, password: str, recipients: List[Dict],
+                 clock: Callable[[], datetime] = datetime.now):
+        """Send digests from `sender` to `recipients` in a background thread"""
+        self.store = store
+        self.sender = sender
+        self.recipients = recipients
+        self.clock = clock
+        self.max_items = settings.get('max_items', 50)
+        # Only items this recent are sent, so turning notifications on doesn't mail the whole database
+        self.lookback = timedelta(hours=settings.get('lookback_hours', 48))
+        self.pool = SmtpPool(settings, sender, password)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._work, name='notifier', daemon=True)
+        self.thread.start()
+
+    def notify(self, run_id: int):
+        """Send what run `run_id` found, without waiting for it to go out"""
+        self.queue.put(run_id)
+
+    def _work(self):
+        while True:
+            entry = self.queue.get()
+            # Runs queued while mail was going out are covered by one digest
+            stopping = entry is STOP
+            while not self.queue.empty():
+                stopping = self.queue.get() is STOP or stopping
+            if entry is not STOP:
+                try:
+                    self.dispatch()
+                except Exception as e:
+                    print(f"⚠ Sending notifications failed, will retry after the next run: {e}")
+            if stopping:
+                return
+
+    def dispatch(self):
+        """Send every recipient a digest of the recent items they haven't had yet"""
+        now = self.clock()
+        for recipient in self.recipients:
+            email = recipient['email']
+            items = [item for item in self.store.unnotified(email, now - self.lookback) if wanted(recipient, item)]
+            if not items:
+                continue
+            self.pool.send(render_digest(self.sender, email, items, self.max_items, now))
+            self.store.record_notified(email, [item['id'] for item in items], now)
+            print(f"✓ Sent {email} a digest of {len(items)} new items")
+
+    def close(self):
+        """Wait for queued digests to go out, then close the connection"""
+        self.queue.put(STOP)
+        self.thread.join()
+        self.pool.close()
+
+
+def from_environment(store: ItemStore, settings: Dict, clock: Callable[[], datetime] = datetime.now) -> Optional[Notifier]:
+    """A notifier for SENDER_EMAIL/SENDER_PASSWORD and the configured recipients, None when not set up"""
+    if not settings.get('enabled', True):
+        return None
+    sender = os.environ.get('SENDER_EMAIL')
+    recipients = load_recipients(settings)
+    if not (sender and recipients):
+        print("⚠ SENDER_EMAIL or RECIPIENT_EMAIL not set, no email notifications")
+        return None
+    return Notifier(store, settings, sender, os.environ.get('SENDER_PASSWORD', ''), recipients, clock)
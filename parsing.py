@@ -0,0 +1,53 @@
+"""
+HTML parsing with lxml, building only the parts of a page that hold listings
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+class ParseStats:
+    def __init__(self):
+        """Parse time and bytes per source, for the end-of-run summary"""
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    def add(self, source: str, seconds: float, size: int):
+        with self._lock:
+            stats = self.sources.setdefault(source, {'pages': 0, 'seconds': 0.0, 'bytes': 0})
+            stats['pages'] += 1
+            stats['seconds'] += seconds
+            stats['bytes'] += size
+
+    def merge(self, source: str, totals: Dict):
+        """Add totals collected elsewhere, e.g. in a parser process"""
+        with self._lock:
+            stats = self.sources.setdefault(source, {'pages': 0, 'seconds': 0.0, 'bytes': 0})
+            for name, value in totals.items():
+                stats[name] += value
+
+    def reset(self):
+        with self._lock:
+            self.sources.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {source: dict(stats) for source, stats in self.sources.items()}
+
+
+parse_stats = ParseStats()
+
+
+def parse_page(content: bytes, source: str, strainer: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Parse a search page of `source`, keeping only what `strainer` matches, and time it"""
+    start = time.perf_counter()
+    soup = parse_html(content, strainer)
+    parse_stats.add(source, time.perf_counter() - start, len(content))
+    return soup
+
+
+def parse_html(content: bytes, strainer: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Parse HTML with lxml, optionally building only what `strainer` matches"""
+    return BeautifulSoup(content, 'lxml', parse_only=strainer)
@@ -0,0 +1,135 @@
+"""
+Listing pipeline: fetched pages are parsed, identified, filtered and stored as a stream
+
+Every stage is a generator over Listing records, so a listing is only fetched
+and parsed when the next stage asks for it and peak memory follows the batch
+size rather than the number of results. A stage takes an iterator of listings
+and returns one; adding a stage is adding it to VintageCoatFinder.stages.
+Pages are parsed in a process pool, off the fetcher threads.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import dedup
+from parsing import parse_stats
+from sources import Listing, SourceDefinition, parse_listings
+
+BATCH_SIZE = 50                 # listings per store transaction
+PARSE_AHEAD = 2                 # pages parsing in the pool while earlier ones are consumed
+
+Stage = Callable[[Iterator[Listing]], Iterator[Listing]]
+
+
+def _parse_job(source: SourceDefinition, content: bytes) -> Tuple[List[Listing], Dict[str, Dict]]:
+    """Runs in a worker process: parse one page and report its parse stats"""
+    parse_stats.reset()
+    items = parse_listings(source, content)
+    return items, parse_stats.summary()
+
+
+class ParsePool:
+    def __init__(self, workers: int = 0):
+        """Parse in `workers` processes, or inline in the calling thread when 0"""
+        self.workers = workers
+        self.executor = None
+        if workers > 0:
+            # Workers start while fetcher threads are running, so never fork them
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, source: SourceDefinition, content: bytes) -> 'Future[List[Listing]]':
+        """Queue a fetched page for parsing; the future resolves to its listings"""
+        result = Future()
+        if self.executor is None:
+            try:
+                result.set_result(parse_listings(source, content))
+            except Exception as e:
+                result.set_exception(e)
+            return result
+
+        job = self.executor.submit(_parse_job, source, content)
+        job.add_done_callback(lambda done: self._finish(done, result))
+        return result
+
+    def _finish(self, job: Future, result: Future):
+        """Fold a worker's parse stats into ours and hand over its listings"""
+        try:
+            items, stats = job.result()
+        except Exception as e:
+            result.set_exception(e)
+            return
+        for source, totals in stats.items():
+            parse_stats.merge(source, totals)
+        result.set_result(items)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def parse_pages(source: SourceDefinition, pages: Iterable[Tuple[str, bytes]], pool: ParsePool,
+                ahead: Optional[int] = None) -> Iterator[Listing]:
+    """Listings of (term, content) pages in page order, parsing `ahead` pages (PARSE_AHEAD by default)
+    ahead of the consumer
+
+    Reading ahead fetches pages before anyone asks for them, so a consumer
+    that may stop early, such as limit(), should pass 0.
+    """
+    # Parsing inline gains nothing from reading ahead
+    if ahead is None:
+        ahead = PARSE_AHEAD
+    if not pool.workers:
+        ahead = 0
+    pending = deque()
+    for term, content in pages:
+        pending.append((term, pool.submit(source, content)))
+        if len(pending) > ahead:
+            yield from _parsed(source, *pending.popleft())
+    while pending:
+        yield from _parsed(source, *pending.popleft())
+
+
+def _parsed(source: SourceDefinition, term: str, future: 'Future[List[Listing]]') -> List[Listing]:
+    try:
+        listings = future.result()
+    except Exception as e:
+        print(f"Error parsing {source.name} results for '{term}': {e}")
+        return []
+    print(f"  Found {len(listings)} listings on {source.name} for '{term}'")
+    return listings
+
+
+def limit(listings: Iterator[Listing], count: int, name: str,
+          reached: Optional[Callable[[], None]] = None) -> Iterator[Listing]:
+    """The first `count` listings; stops pulling from earlier stages once they are through, then calls `reached`"""
+    for n, listing in enumerate(listings, 1):
+        yield listing
+        if n >= count:
+            print(f"  Reached limit of {count} items for {name}")
+            if reached:
+                reached()
+            return
+
+
+def identify(listings: Iterator[Listing]) -> Iterator[Listing]:
+    """Give each listing its stable id, from the canonical URL"""
+    for listing in listings:
+        listing.id = dedup.item_id(listing.title, listing.url)
+        yield listing
+
+
+def skip_repeats(listings: Iterator[Listing]) -> Iterator[Listing]:
+    """Drop listings already passed on in this run, such as one item found on eBay DE and eBay UK"""
+    passed = set()
+    for listing in listings:
+        if listing.id not in passed:
+            passed.add(listing.id)
+            yield listing
+
+
+def batched(listings: Iterable[Listing], size: int = BATCH_SIZE) -> Iterator[List[Listing]]:
+    listings = iter(listings)
+    while batch := list(islice(listings, size)):
+        yield batch
@@ -0,0 +1,105 @@
+"""
+Turn scraped price text like "EUR 129,00", "£45.00 + £3.50 postage" or "120 € VB"
+into numbers, converted to one base currency so prices from every source compare
+"""
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Longest markers first, so "US $" wins over "$"
+CURRENCY_MARKERS = [
+    ('US $', 'USD'), ('USD', 'USD'), ('EUR', 'EUR'), ('GBP', 'GBP'),
+    ('€', 'EUR'), ('£', 'GBP'), ('$', 'USD'),
+]
+
+# Units of the base currency per unit of each currency; override under "currency" in config.json
+DEFAULT_BASE = 'EUR'
+DEFAULT_RATES = {'EUR': 1.0, 'GBP': 1.17, 'USD': 0.92}
+
+NUMBER = re.compile(r'\d[\d.,\s]*')
+# Everything from here on is about shipping, not the item ("+ Versand", "zzgl. Versand", "+£3.50 postage")
+SHIPPING = re.compile(r'\+|\bzzgl\b|\binkl\b|\bplus\b|versand|shipping|postage|delivery|\bp&p\b', re.IGNORECASE)
+# "10 € - 20 €", "EUR 10,00 bis EUR 20,00", "$10.00 to $20.00": the lower bound is the price
+RANGE = re.compile(r'\s(?:-|–|bis|to)\s', re.IGNORECASE)
+NEGOTIABLE = re.compile(r'\bVB\b|verhandlungsbasis|verhandelbar|negotiable|\bONO\b|\bOBO\b|best offer', re.IGNORECASE)
+FREE = re.compile(r'zu verschenken', re.IGNORECASE)
+
+
+class Price(NamedTuple):
+    cents: Optional[int]          # amount as listed
+    currency: Optional[str]       # ISO code, None if the text doesn't say
+    base_cents: Optional[int]     # amount in the base currency
+    negotiable: bool
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """Read a number written with either decimal separator: 1.234,50 / 1,234.50 / 129,00 / 45.00"""
+    digits = re.sub(r'\s', '', text).rstrip('.,')
+    if not digits:
+        return None
+    last_dot, last_comma = digits.rfind('.'), digits.rfind(',')
+    if last_dot >= 0 and last_comma >= 0:
+        # Both present: whichever comes last is the decimal separator
+        decimal = '.' if last_dot > last_comma else ','
+    elif last_dot >= 0 or last_comma >= 0:
+        separator = '.' if last_dot >= 0 else ','
+        whole, _, fraction = digits.rpartition(separator)
+        # One separator followed by exactly three digits groups thousands ("1.234", "1,234")
+        decimal = None if len(fraction) == 3 or digits.count(separator) > 1 else separator
+    else:
+        decimal = None
+    if decimal:
+        whole, _, fraction = digits.rpartition(decimal)
+        digits = f"{re.sub(r'[.,]', '', whole)}.{fraction}"
+    else:
+        digits = re.sub(r'[.,]', '', digits)
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def _currency(text: str) -> Optional[str]:
+    return next((code for marker, code in CURRENCY_MARKERS if marker in text), None)
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+    """Price text as (amount in cents, ISO currency code); None where it can't be read"""
+    if not text:
+        return None, None
+    item_part = SHIPPING.split(text, 1)[0]
+    item_part = RANGE.split(item_part, 1)[0]
+    currency = _currency(item_part) or _currency(text)
+    if FREE.search(text):
+        return 0, currency
+    match = NUMBER.search(item_part)
+    amount = parse_amount(match.group()) if match else None
+    if amount is None:
+        return None, currency
+    return round(amount * 100), currency
+
+
+class PriceNormalizer:
+    def __init__(self, config: Optional[Dict] = None):
+        """Convert with the offline rate table in config.json's "currency" section"""
+        config = config or {}
+        self.base = config.get('base', DEFAULT_BASE)
+        # The defaults are per euro, so they are rebased onto another base; for a base they don't
+        # know, only the configured rates apply and other currencies are left unconverted
+        defaults = {}
+        if self.base in DEFAULT_RATES:
+            defaults = {code: rate / DEFAULT_RATES[self.base] for code, rate in DEFAULT_RATES.items()}
+        self.rates = dict(defaults, **config.get('rates', {}))
+        self.rates[self.base] = 1.0
+        # Prices without a currency marker are most likely in the base currency
+        self.default_currency = config.get('default_currency', self.base)
+
+    def to_base(self, cents: Optional[int], currency: Optional[str]) -> Optional[int]:
+        rate = self.rates.get(currency or self.default_currency)
+        if cents is None or rate is None:
+            return None
+        return round(cents * rate)
+
+    def normalize(self, text: Optional[str]) -> Price:
+        cents, currency = parse_price(text)
+        negotiable = bool(text and NEGOTIABLE.search(text))
+        return Price(cents, currency, self.to_base(cents, currency), negotiable)
@@ -0,0 +1,88 @@
+"""
+Per-host token-bucket rate limiting
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+DEFAULT_LIMIT = {'rate': 0.5, 'burst': 1}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        """Bucket that refills `rate` tokens per second up to `burst` tokens"""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the wait in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token now and sleep outside the lock, so waiters queue up fairly
+            self.tokens -= 1
+            wait = max(self.blocked_until - now, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def defer(self, seconds: float):
+        """Block the bucket for `seconds`, e.g. after a 429 response"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    def __init__(self, config: Optional[Dict] = None):
+        """Initialize from the "rate_limits" section of config.json"""
+        config = config or {}
+        self.default = dict(DEFAULT_LIMIT, **config.get('default', {}))
+        self.limits = {host: dict(self.default, **limit) for host, limit in config.items() if host != 'default'}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Get the bucket for a host, creating it on first use"""
+        with self._lock:
+            if host not in self._buckets:
+                limit = self.limits.get(host, self.default)
+                self._buckets[host] = TokenBucket(limit['rate'], limit['burst'])
+            return self._buckets[host]
+
+    def acquire(self, host: str) -> float:
+        """Wait until a request to host is allowed"""
+        return self.bucket(host).acquire()
+
+    def defer(self, host: str, seconds: float):
+        """Hold back all requests to host for `seconds`"""
+        print(f"  Rate limited by {host}, pausing it for {seconds:.1f}s")
+        self.bucket(host).defer(seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
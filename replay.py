@@ -0,0 +1,102 @@
+"""
+Record HTTP exchanges to a fixture archive and replay them offline
+"""
+import base64
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from response_cache import STORED_HEADERS, normalize_url
+
+ARCHIVE_VERSION = 1
+
+
+class Recorder:
+    def __init__(self, path: str):
+        """Collect exchanges in memory and write them to `path` on save()"""
+        self.path = path
+        self.recorded_at = datetime.now()
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def record(self, url: str, params: Optional[Dict], response: requests.Response):
+        """Remember one HTTP exchange"""
+        exchange = {
+            'key': normalize_url(url, params),
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            'elapsed': response.elapsed.total_seconds(),
+            'body': base64.b64encode(response.content).decode('ascii'),
+        }
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def save(self):
+        """Write the archive as gzipped JSON lines, header first"""
+        with self._lock:
+            exchanges = sorted(self.exchanges, key=lambda exchange: exchange['key'])
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'version': ARCHIVE_VERSION, 'recorded_at': self.recorded_at.isoformat()}) + '\n')
+            for exchange in exchanges:
+                f.write(json.dumps(exchange, separators=(',', ':')) + '\n')
+        print(f"Recorded {len(exchanges)} HTTP exchanges to {self.path}")
+
+
+class Replayer:
+    def __init__(self, path: str, simulate_latency: bool = False):
+        """Load an archive written by Recorder"""
+        self.path = path
+        self.simulate_latency = simulate_latency
+        self.exchanges = {}
+        self._lock = threading.Lock()
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version in {path}: {header.get('version')}")
+            self.recorded_at = datetime.fromisoformat(header['recorded_at'])
+            for line in f:
+                exchange = json.loads(line)
+                self.exchanges.setdefault(exchange['key'], []).append(exchange)
+
+    def fetch(self, url: str, params: Optional[Dict] = None) -> Optional[requests.Response]:
+        """Serve the recorded response for a request, like HttpClient.get"""
+        key = normalize_url(url, params)
+        with self._lock:
+            recorded: List[Dict] = self.exchanges.get(key, [])
+            # Repeated requests get the recorded responses in order, then the last one again
+            exchange = recorded.pop(0) if len(recorded) > 1 else (recorded[0] if recorded else None)
+
+        if exchange is None:
+            print(f"  ⚠ No recorded response for {key}")
+            return None
+        if self.simulate_latency:
+            time.sleep(exchange['elapsed'])
+        if exchange['status'] >= 400:
+            return None
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response._content = base64.b64decode(exchange['body'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = key
+        return response
+
+
+class ReplayClock:
+    def __init__(self, start: datetime):
+        """Deterministic clock: every call is one microsecond after the last"""
+        self.current = start
+        self._lock = threading.Lock()
+
+    def __call__(self) -> datetime:
+        with self._lock:
+            self.current += timedelta(microseconds=1)
+            return self.current
@@ -0,0 +1,144 @@
+"""
+Persistent HTTP response cache with TTL, conditional revalidation and LRU eviction
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Query parameters that never change the response and must not end up in keys
+IGNORED_PARAMS = {'api_key'}
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+
+def normalize_url(url: str, params: Optional[Dict] = None) -> str:
+    """Build a canonical URL: lowercase scheme/host, sorted query, no secrets"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((key, str(value)) for key, value in params.items())
+    query = sorted((key, value) for key, value in query if key not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+class ResponseCache:
+    def __init__(self, config: Optional[Dict] = None):
+        """Initialize the cache from the "cache" section of config.json"""
+        config = config or {}
+        self.path = config.get('path', '.http_cache.db')
+        self.max_bytes = config.get('max_bytes', 50 * 1024 * 1024)
+        ttl = config.get('ttl', {})
+        self.default_ttl = ttl.get('default', 3600)
+        self.ttls = {host: seconds for host, seconds in ttl.items() if host != 'default'}
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                stored_at REAL,
+                accessed_at REAL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+        self.conn.commit()
+
+    def ttl_for(self, host: str) -> float:
+        """Seconds a response from host stays fresh"""
+        return self.ttls.get(host, self.default_ttl)
+
+    def lookup(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """Return the cached entry for a request, marking it recently used"""
+        key = self._key(url, params)
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+
+        cached_url, status, headers, body, stored_at = row
+        return {
+            'key': key,
+            'url': cached_url,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': body,
+            'fresh': time.time() - stored_at < self.ttl_for(urlsplit(url).netloc.lower()),
+        }
+
+    def validators(self, entry: Dict) -> Dict:
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def refresh(self, entry: Dict):
+        """Mark a revalidated (304) entry as fresh again"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, entry['key'])
+            )
+            self.conn.commit()
+
+    def store(self, url: str, params: Optional[Dict], response: requests.Response):
+        """Cache a successful response and evict old entries over the size limit"""
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = response.content
+        now = time.time()
+        # The normalized URL is stored rather than response.url so secrets never reach disk
+        with self._lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO responses (key, url, status, headers, body, size, stored_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (self._key(url, params), normalize_url(url, params), response.status_code, json.dumps(headers), body, len(body), now, now))
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall():
+            self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def to_response(self, entry: Dict) -> requests.Response:
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = entry['url']
+        response.from_cache = True
+        return response
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _key(self, url: str, params: Optional[Dict]) -> str:
+        return hashlib.sha256(normalize_url(url, params).encode()).hexdigest()
@@ -6,755 +6,514 @@ Searches multiple sources for vintage coats and sends email notifications
 
 import os
 import json
-import sqlite3
-import hashlib
-from datetime import datetime
-from typing import List, Dict, Optional
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import heapq
+import random
+import signal
 import time
-import re
+from datetime import datetime, timedelta
+from typing import Iterator, List, Dict, Optional, Tuple
+import requests
+import dedup
+import notifier
+from feed_server import FeedServer
+from http_client import HttpClient
+from parsing import parse_stats
+from pipeline import BATCH_SIZE, ParsePool, Stage, batched, identify, limit, parse_pages, skip_repeats
+from rate_limit import RateLimiter
+from response_cache import ResponseCache
+from replay import Recorder, Replayer, ReplayClock
+from sources import Listing, SourceDefinition, load_sources
+from storage import ItemStore
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Marks the end of a source's listings on its queue
+SOURCE_DONE = object()
 
 
 class VintageCoatFinder:
-    def __init__(self, config_path='config.json'):
-        """Initialize the finder with configuration"""
+    def __init__(self, config_path='config.json', record: Optional[str] = None, replay: Optional[str] = None,
+                 simulate_latency: bool = False, polling: bool = False):
+        """Initialize the finder with configuration; `polling` is for the daemon, which searches repeatedly"""
         with open(config_path, 'r') as f:
             self.config = json.load(f)
 
         self.db_path = 'seen_items.db'
-        # Delete old database to start fresh each time
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-            print(f"Deleted old database to start fresh")
-        self.setup_database()
-        self.results = []
-
-    def setup_database(self):
-        """Create fresh database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS seen_items (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                url TEXT,
-                price TEXT,
-                source TEXT,
-                found_date TEXT,
-                image_url TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-    
-    def make_request(self, url: str, max_retries: int = 3) -> Optional[requests.Response]:
-        """Make HTTP request with retry logic"""
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(url, headers=headers, timeout=15)
-                response.raise_for_status()
-                return response
-            except requests.RequestException as e:
-                print(f"Request attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                else:
-                    print(f"Failed to fetch {url} after {max_retries} attempts")
-                    return None
-    
-    def generate_item_id(self, title: str, url: str) -> str:
-        """Generate unique ID for an item"""
-        unique_string = f"{title}_{url}"
-        return hashlib.md5(unique_string.encode()).hexdigest()
-    
-    def save_item(self, item: Dict):
-        """Save item to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO seen_items (id, title, url, price, source, found_date, image_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            item['id'],
-            item['title'],
-            item['url'],
-            item.get('price', 'N/A'),
-            item['source'],
-            datetime.now().isoformat(),
-            item.get('image_url', '')
-        ))
-        conn.commit()
-        conn.close()
-    
-    def search_kleinanzeigen(self):
-        """Search Kleinanzeigen (formerly eBay Kleinanzeigen)"""
-        print("Searching Kleinanzeigen...")
-
-        # Build search URL
-        search_terms = '+'.join(self.config['search_terms'])
-        base_url = "https://www.kleinanzeigen.de/s-kleidung-damen/c153"
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-
-        max_per_source = self.config.get('max_results_per_source', 10)
-        items_found = 0
-
-        try:
-            # Search for each term combination
-            for term in self.config['search_terms']:
-                if items_found >= max_per_source:
-                    print(f"  Reached limit of {max_per_source} items for Kleinanzeigen")
-                    break
-                search_url = f"{base_url}?keywords={term.replace(' ', '+')}"
-                print(f"  Searching Kleinanzeigen for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Parse listings (adjust selectors based on actual site structure)
-                    listings = soup.find_all('article', class_='aditem')
-                    print(f"  Found {len(listings)} listings on Kleinanzeigen for '{term}'")
-
-                    for listing in listings:
-                        if items_found >= max_per_source:
-                            break
-
-                        try:
-                            title_elem = listing.find('a', class_='ellipsis')
-                            price_elem = listing.find('p', class_='aditem-main--middle--price-shipping--price')
-
-                            # Find image
-                            image_url = ''
-                            img_elem = listing.find('img')
-                            if img_elem:
-                                image_url = img_elem.get('src', '') or img_elem.get('data-src', '')
-
-                            if title_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = 'https://www.kleinanzeigen.de' + title_elem['href']
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'Kleinanzeigen',
-                                    'image_url': image_url
-                                }
-
-                                self.results.append(item)
-                                self.save_item(item)
-                                items_found += 1
-                                print(f"  ✓ Item found: {title[:50]}...")
-                        except Exception as e:
-                            print(f"  Error parsing listing: {e}")
-                            continue
-
-                time.sleep(2)  # Be polite, wait between requests
-
-        except Exception as e:
-            print(f"Error searching Kleinanzeigen: {e}")
-
-    def search_ebay(self):
-        """Search eBay Germany"""
-        print("Searching eBay...")
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-
-        max_per_source = self.config.get('max_results_per_source', 10)
-        items_found = 0
-
-        try:
-            for term in self.config['search_terms']:
-                if items_found >= max_per_source:
-                    print(f"  Reached limit of {max_per_source} items for eBay Germany")
-                    break
-                # eBay Germany search URL
-                search_url = f"https://www.ebay.de/sch/i.html?_nkw={term.replace(' ', '+')}&_sacat=11450"
-                print(f"  Searching eBay Germany for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=30)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # eBay uses ul.srp-results container
-                    results_container = soup.find('ul', class_='srp-results')
-                    listings = []
-                    if results_container:
-                        listings = results_container.find_all('li', class_='s-card', recursive=False)
-
-                    print(f"  Found {len(listings)} listings on eBay Germany for '{term}'")
-
-                    for listing in listings:
-                        if items_found >= max_per_source:
-                            break
-
-                        try:
-                            # Find title - any div with "title" in class
-                            title_elem = listing.find('div', class_=lambda x: x and 'title' in str(x).lower())
-
-                            # Find link - any a with "/itm/" in href
-                            link_elem = listing.find('a', href=lambda x: x and '/itm/' in str(x))
-
-                            # Find price - any span with "price" in class
-                            price_elem = listing.find('span', class_=lambda x: x and 'price' in str(x))
-
-                            # Find image
-                            image_url = ''
-                            img_elem = listing.find('img')
-                            if img_elem:
-                                image_url = img_elem.get('src', '') or img_elem.get('data-src', '')
-
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                # Skip eBay's "Shop on eBay" header item
-                                if title.lower() in ['shop on ebay', 'ergebnisse']:
-                                    continue
-
-                                url = link_elem['href']
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'eBay',
-                                    'image_url': image_url
-                                }
-
-                                self.results.append(item)
-                                self.save_item(item)
-                                items_found += 1
-                                print(f"  ✓ Item found: {title[:50]}...")
-                        except Exception as e:
-                            print(f"Error parsing eBay listing: {e}")
-                            continue
-
-                time.sleep(2)
-
-        except Exception as e:
-            print(f"Error searching eBay: {e}")
-
-    def search_ebay_uk(self):
-        """Search eBay UK"""
-        print("Searching eBay UK...")
+        # The store persists between runs, so items found earlier are recognised
+        self.store = ItemStore(self.db_path, self.config.get('currency'))
+        self.found_count = 0
+        self.new_items = []
+        self.price_drops = []
+        self.gone_items = []
+        # Families whose search this run didn't read to the end, so a listing missing from it isn't gone
+        self.incomplete = set()
+        # Families this run searches as a full pass, the only runs that can tell which listings are gone
+        self.full_pass = set()
+        # The run being searched, set by search()
+        self.run_id = None
+        # Recording must see real traffic and replay never touches the network, so both skip the cache,
+        # as does polling, which would otherwise see the same cached pages until they expire
+        cache_config = self.config.get('cache', {})
+        use_cache = cache_config.get('enabled', False) and not (record or replay or polling)
+        cache = ResponseCache(cache_config) if use_cache else None
+        self.http = HttpClient(self.config.get('http'), RateLimiter(self.config.get('rate_limits')), cache)
+
+        self.clock = datetime.now
+        if record:
+            self.http.recorder = Recorder(record)
+        if replay:
+            self.http.replayer = Replayer(replay, simulate_latency)
+            self.clock = ReplayClock(self.http.replayer.recorded_at)
+
+        # Recorded or replayed listings aren't news, so only live runs send email
+        self.notifier = None
+        if not (record or replay):
+            self.notifier = notifier.from_environment(self.store, self.config.get('notifications', {}), self.clock)
+
+        self.sources = load_sources(self.config)
+        self.parse_pool = ParsePool(self.config.get('parsing', {}).get('workers', 0))
+        self._host_locks = {}
+        self._host_locks_guard = threading.Lock()
+        pipeline = self.config.get('pipeline', {})
+        self.batch_size = max(1, pipeline.get('batch_size', BATCH_SIZE))
+        # Batches a concurrently running source may get ahead of the store before it waits
+        self.queued_batches = max(1, pipeline.get('max_queued_batches', 4))
+        # Applied in order to every listing between the sources and the store
+        self.stages: List[Stage] = [identify, skip_repeats]
+
+    def make_request(self, url: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> Optional[requests.Response]:
+        """Make HTTP request with retry logic over the pooled client"""
+        return self.http.get(url, params=params, timeout=timeout)
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-
-        max_per_source = self.config.get('max_results_per_source', 10)
-        items_found = 0
-
-        try:
-            for term in self.config['search_terms']:
-                if items_found >= max_per_source:
-                    print(f"  Reached limit of {max_per_source} items for eBay UK")
-                    break
-                # eBay UK search URL
-                search_url = f"https://www.ebay.co.uk/sch/i.html?_nkw={term.replace(' ', '+')}&_sacat=11450"
-                print(f"  Searching eBay UK for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=30)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # eBay uses ul.srp-results container
-                    results_container = soup.find('ul', class_='srp-results')
-                    listings = []
-                    if results_container:
-                        listings = results_container.find_all('li', class_='s-card', recursive=False)
-
-                    print(f"  Found {len(listings)} listings on eBay UK for '{term}'")
-
-                    for listing in listings:
-                        if items_found >= max_per_source:
-                            break
-
-                        try:
-                            # Find title - any div with "title" in class
-                            title_elem = listing.find('div', class_=lambda x: x and 'title' in str(x).lower())
-
-                            # Find link - any a with "/itm/" in href
-                            link_elem = listing.find('a', href=lambda x: x and '/itm/' in str(x))
-
-                            # Find price - any span with "price" in class
-                            price_elem = listing.find('span', class_=lambda x: x and 'price' in str(x))
-
-                            # Find image
-                            image_url = ''
-                            img_elem = listing.find('img')
-                            if img_elem:
-                                image_url = img_elem.get('src', '') or img_elem.get('data-src', '')
-
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                # Skip eBay's "Shop on eBay" header item
-                                if title.lower() in ['shop on ebay', 'results']:
-                                    continue
-
-                                url = link_elem['href']
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'eBay UK',
-                                    'image_url': image_url
-                                }
-
-                                self.results.append(item)
-                                self.save_item(item)
-                                items_found += 1
-                                print(f"  ✓ Item found: {title[:50]}...")
-                        except Exception as e:
-                            print(f"Error parsing eBay UK listing: {e}")
-                            continue
-
-                time.sleep(2)
-
-        except Exception as e:
-            print(f"Error searching eBay UK: {e}")
-
-    def search_vinted(self):
-        """Search Vinted"""
-        print("Searching Vinted...")
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-
-        try:
-            for term in self.config['search_terms']:
-                search_url = f"https://www.vinted.de/vetements?search_text={term.replace(' ', '+')}"
-                print(f"  Searching Vinted for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Vinted uses dynamic loading, so basic scraping might not get all items
-                    # This is a simplified version - might need Selenium for full results
-                    listings = soup.find_all('div', class_='feed-grid__item')
-                    print(f"  Found {len(listings)} listings on Vinted for '{term}' (Note: Vinted uses JavaScript, may show 0)")
-
-                    for listing in listings[:10]:
-                        try:
-                            title_elem = listing.find('h3')
-                            link_elem = listing.find('a')
-                            price_elem = listing.find('span', class_='price')
-                            
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = 'https://www.vinted.de' + link_elem['href']
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-                                
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'Vinted'
-                                }
-                                
-                                if not self.is_item_seen(item['id']):
-                                    self.results.append(item)
-                                    self.mark_item_seen(item)
-                        except Exception as e:
-                            print(f"Error parsing Vinted listing: {e}")
-                            continue
-                
-                time.sleep(2)
-                
-        except Exception as e:
-            print(f"Error searching Vinted: {e}")
+    def generate_item_id(self, title: str, url: str) -> str:
+        """Generate unique ID for an item, from its canonical URL"""
+        return dedup.item_id(title, url)
     
-    def search_google_shopping(self):
-        """Search Google Shopping via SerpAPI"""
-        print("Searching Google Shopping (via SerpAPI)...")
-
-        serpapi_key = os.environ.get('SERPAPI_KEY')
-        print(f"  DEBUG: SERPAPI_KEY present: {bool(serpapi_key)}")
-        if serpapi_key:
-            print(f"  DEBUG: SERPAPI_KEY length: {len(serpapi_key)} chars")
-            print(f"  DEBUG: SERPAPI_KEY starts with: {serpapi_key[:8]}...")
-        if not serpapi_key:
-            print("  ⚠ SERPAPI_KEY not found, skipping Google Shopping")
+    def is_item_seen(self, item_id: str) -> bool:
+        """Check if item was found by this or an earlier run"""
+        return self.store.is_item_seen(item_id)
+
+    def mark_item_seen(self, item: Listing, run_id: int) -> bool:
+        """Save item to database, returning True if it was never seen before"""
+        return self.store.mark_item_seen(item, run_id, self.clock())
+
+    def mark_items_seen(self, items: List[Listing], run_id: int) -> List[bool]:
+        """Save a batch of items in one transaction, flagging the ones never seen before"""
+        return self.store.mark_items_seen(items, run_id, self.clock())
+
+    def _host_lock(self, host: str) -> threading.Lock:
+        """Get the lock that serializes access to a single host"""
+        with self._host_locks_guard:
+            if host not in self._host_locks:
+                self._host_locks[host] = threading.Lock()
+            return self._host_locks[host]
+
+    def get_sources(self) -> List[SourceDefinition]:
+        """Enabled sources, in output order"""
+        return [source for source in self.sources if self.config.get(source.config_key, True)]
+
+    def _produce(self, source: SourceDefinition, out: queue.Queue, stop: threading.Event):
+        """Search one source into its queue, a batch at a time, until done or the consumer stops"""
+        def put(entry) -> bool:
+            while not stop.is_set():
+                try:
+                    out.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        if stop.is_set():
             return
-
-        max_per_source = self.config.get('max_results_per_source', 10)
-        items_found = 0
-
+        host_lock = self._host_lock(source.host)
+        batches = batched(self.search_source(source), self.batch_size)
         try:
-            for term in self.config['search_terms']:
-                if items_found >= max_per_source:
-                    print(f"  Reached limit of {max_per_source} items for Google Shopping")
+            while True:
+                # Sources on the same host never fetch at the same time. The lock is only held while
+                # fetching: the consumer drains sources in order, so a later source on the host that
+                # waited for the consumer while holding it would block an earlier one for good
+                with host_lock:
+                    batch = next(batches, None)
+                if batch is None or not put(batch):
                     break
-                print(f"  Searching Google Shopping for: {term}")
-
-                # SerpAPI request
-                params = {
-                    "api_key": serpapi_key,
-                    "q": term,
-                    "tbm": "shop",  # Shopping results
-                    "location": "Germany",
-                    "hl": "en",  # Language
-                    "gl": "de",  # Country
-                }
-
-                response = requests.get("https://serpapi.com/search", params=params, timeout=15)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    shopping_results = data.get('shopping_results', [])
-
-                    print(f"  Found {len(shopping_results)} products on Google Shopping for '{term}'")
-
-                    for idx, result in enumerate(shopping_results):
-                        if items_found >= max_per_source:
-                            break
-
-                        try:
-                            title = result.get('title', 'No title')
-                            price = result.get('price', 'N/A')
-                            link = result.get('product_link', '')  # SerpAPI uses 'product_link', not 'link'
-                            source = result.get('source', 'Unknown Store')
-                            image_url = result.get('thumbnail', '')
-
-                            if not link:
-                                print(f"  DEBUG: Skipping item {idx} - no product_link")
-                                continue
-
-                            item = {
-                                'id': self.generate_item_id(title, link),
-                                'title': title,
-                                'url': link,
-                                'price': price,
-                                'source': f'Google Shopping ({source})',
-                                'image_url': image_url
-                            }
-
-                            self.results.append(item)
-                            self.save_item(item)
-                            items_found += 1
-                            print(f"  ✓ Item found: {title[:50]}...")
-
-                        except Exception as e:
-                            print(f"  Error parsing Google Shopping result: {e}")
-                            continue
-
-                else:
-                    print(f"  ⚠ SerpAPI returned status {response.status_code}")
-
-                time.sleep(2)  # Be polite between requests
-
         except Exception as e:
-            print(f"Error searching Google Shopping: {e}")
-
-    def search_google(self):
-        """Search via Google (for general web results)"""
-        print("Searching Google...")
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+            self.incomplete.add(source.family or source.name)
+            print(f"Error searching {source.name}: {e}")
+        finally:
+            with host_lock:
+                batches.close()
+        if not stop.is_set():
+            put(SOURCE_DONE)
+
+    async def _produce_async(self, sources: List[SourceDefinition], queues: List[queue.Queue],
+                             stop: threading.Event, max_workers: int):
+        """Run sources as asyncio tasks, at most max_workers at a time"""
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def run_one(source, out):
+            async with semaphore:
+                await asyncio.to_thread(self._produce, source, out, stop)
+
+        await asyncio.gather(*(run_one(source, out) for source, out in zip(sources, queues)))
+
+    def run_sources(self, sources: List[SourceDefinition]) -> Iterator[Listing]:
+        """Run sources using the configured concurrency mode, yielding their listings in source order"""
+        concurrency = self.config.get('concurrency', {})
+        mode = concurrency.get('mode', 'sequential')
+        max_workers = max(1, concurrency.get('max_workers', 4))
+
+        if mode not in ('threads', 'asyncio'):
+            for source in sources:
+                try:
+                    yield from self.search_source(source)
+                except Exception as e:
+                    self.incomplete.add(source.family or source.name)
+                    print(f"Error searching {source.name}: {e}")
+            return
 
+        # Each source fills a bounded queue, so one that runs ahead of the store waits instead of piling up
+        # listings; earlier sources are handed on while later ones are still running
+        queues = [queue.Queue(self.queued_batches) for _ in sources]
+        stop = threading.Event()
+        if mode == 'threads':
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            for source, out in zip(sources, queues):
+                executor.submit(self._produce, source, out, stop)
+            finish = lambda: executor.shutdown(cancel_futures=True)
+        else:
+            runner = threading.Thread(target=asyncio.run,
+                                      args=(self._produce_async(sources, queues, stop, max_workers),))
+            runner.start()
+            finish = runner.join
         try:
-            for term in self.config['search_terms']:
-                # Add "vintage coat" and location to search
-                query = f"{term} vintage coat berlin"
-                search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}&num=10"
-                print(f"  Searching Google for: {query}")
-
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Parse Google search results
-                    search_results = soup.find_all('div', class_='g')
-                    print(f"  Found {len(search_results)} results on Google for '{query}'")
-
-                    for result in search_results[:5]:  # Top 5 results
-                        try:
-                            title_elem = result.find('h3')
-                            link_elem = result.find('a')
-                            
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = link_elem['href']
-                                
-                                # Skip if not a relevant domain
-                                if any(skip in url.lower() for skip in ['google.com', 'youtube.com']):
-                                    continue
-                                
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': 'N/A',
-                                    'source': 'Google Search'
-                                }
-                                
-                                if not self.is_item_seen(item['id']):
-                                    self.results.append(item)
-                                    self.mark_item_seen(item)
-                        except Exception as e:
-                            print(f"Error parsing Google result: {e}")
-                            continue
-                
-                time.sleep(3)  # Be extra polite with Google
-                
-        except Exception as e:
-            print(f"Error searching Google: {e}")
-
-    def search_vintage_threads(self):
-        """Search Vintage Threads"""
-        print("Searching Vintage Threads...")
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+            for out in queues:
+                while (batch := out.get()) is not SOURCE_DONE:
+                    yield from batch
+        finally:
+            stop.set()
+            finish()
+
+    def fetch_pages(self, source: SourceDefinition) -> Iterator[Tuple[str, bytes]]:
+        """(term, content) of each search page of a source, fetched as they are asked for"""
+        params = dict(source.params)
+        if source.kind == 'serpapi':
+            serpapi_key = os.environ.get('SERPAPI_KEY')
+            if not serpapi_key and self.http.replayer:
+                # Archive keys leave out api_key, so an offline replay matches without the real one
+                serpapi_key = 'replay'
+            if not serpapi_key:
+                print(f"  ⚠ SERPAPI_KEY not found, skipping {source.name}")
+                self.incomplete.add(source.family or source.name)
+                return
+            params['api_key'] = serpapi_key
 
         try:
             for term in self.config['search_terms']:
-                # Vintage Threads search URL structure
-                search_url = f"https://vintage-threads.com/search?q={term.replace(' ', '+')}"
-                print(f"  Searching Vintage Threads for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Common e-commerce patterns - adjust if needed
-                    listings = soup.find_all('div', class_=['product-item', 'product', 'item'])
-                    if not listings:
-                        listings = soup.find_all('article')
-
-                    print(f"  Found {len(listings)} listings on Vintage Threads for '{term}'")
-
-                    for listing in listings[:10]:
-                        try:
-                            # Try common selector patterns
-                            title_elem = listing.find(['h2', 'h3', 'h4'], class_=re.compile('product|title|name'))
-                            if not title_elem:
-                                title_elem = listing.find('a', class_=re.compile('product|title'))
-
-                            link_elem = listing.find('a', href=True)
-                            price_elem = listing.find(['span', 'div', 'p'], class_=re.compile('price'))
-
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = link_elem['href']
-                                if not url.startswith('http'):
-                                    url = 'https://vintage-threads.com' + url
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'Vintage Threads'
-                                }
-
-                                if not self.is_item_seen(item['id']):
-                                    self.results.append(item)
-                                    self.mark_item_seen(item)
-                        except Exception as e:
-                            print(f"Error parsing Vintage Threads listing: {e}")
-                            continue
-
-                time.sleep(2)
-
-        except Exception as e:
-            print(f"Error searching Vintage Threads: {e}")
-
-    def search_vilis_vintage(self):
-        """Search Vilis Vintage"""
-        print("Searching Vilis Vintage...")
+                print(f"  Searching {source.name} for: {term}")
+                if source.kind == 'serpapi':
+                    response = self.make_request(source.url, params=dict(params, q=term), timeout=source.timeout)
+                else:
+                    response = self.make_request(source.search_url(term), timeout=source.timeout)
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+                if response is None:
+                    print(f"  ⚠ {source.name} request failed for '{term}'")
+                    self.incomplete.add(source.family or source.name)
+                    continue
 
-        try:
-            for term in self.config['search_terms']:
-                # Vilis Vintage search URL structure
-                search_url = f"https://www.vilisvintage.com/search?q={term.replace(' ', '+')}"
-                print(f"  Searching Vilis Vintage for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Common e-commerce patterns
-                    listings = soup.find_all('div', class_=['product-item', 'product', 'item'])
-                    if not listings:
-                        listings = soup.find_all('article')
-
-                    print(f"  Found {len(listings)} listings on Vilis Vintage for '{term}'")
-
-                    for listing in listings[:10]:
-                        try:
-                            title_elem = listing.find(['h2', 'h3', 'h4'], class_=re.compile('product|title|name'))
-                            if not title_elem:
-                                title_elem = listing.find('a', class_=re.compile('product|title'))
-
-                            link_elem = listing.find('a', href=True)
-                            price_elem = listing.find(['span', 'div', 'p'], class_=re.compile('price'))
-
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = link_elem['href']
-                                if not url.startswith('http'):
-                                    url = 'https://www.vilisvintage.com' + url
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'Vilis Vintage'
-                                }
-
-                                if not self.is_item_seen(item['id']):
-                                    self.results.append(item)
-                                    self.mark_item_seen(item)
-                        except Exception as e:
-                            print(f"Error parsing Vilis Vintage listing: {e}")
-                            continue
-
-                time.sleep(2)
+                yield term, response.content
 
         except Exception as e:
-            print(f"Error searching Vilis Vintage: {e}")
-
-    def search_etsy(self):
-        """Search Etsy"""
-        print("Searching Etsy...")
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-
+            self.incomplete.add(source.family or source.name)
+            print(f"Error searching {source.name}: {e}")
+
+    def crawl_pages(self, source: SourceDefinition) -> Iterator[Listing]:
+        """Page through a source's newest-first results for every term until a page holds nothing new
+
+        Only a term paged through to an empty page has had all its listings read;
+        any other stop leaves the source's family out of this run's gone items.
+        A full pass doesn't stop at pages of known listings.
+        """
+        full_pass = (source.family or source.name) in self.full_pass
+        max_pages = self.config.get('pagination', {}).get('max_pages', 10)
+        # Listings move down a page as new ones arrive, so ids from earlier pages count as seen too
+        crawled = set()
+        for term in self.config['search_terms']:
+            for page in range(1, max_pages + 1):
+                print(f"  Searching {source.name} for: {term} (page {page})")
+                response = self.make_request(source.search_url(term, page), timeout=source.timeout)
+                if response is None:
+                    print(f"  ⚠ {source.name} request failed for '{term}', page {page}")
+                    self.incomplete.add(source.family or source.name)
+                    break
+                listings = list(parse_pages(source, [(term, response.content)], self.parse_pool))
+                # Only listings stored by earlier runs count, never what this run has stored so far: that
+                # depends on how far the store got with other sources, which varies with the concurrency mode
+                ids = {dedup.item_id(listing.title, listing.url) for listing in listings}
+                seen = self.store.seen_ids(list(ids - crawled), self.run_id) | (ids & crawled)
+                crawled |= ids
+                yield from listings
+                if not listings:
+                    break
+                if seen >= ids and not full_pass:
+                    print(f"  Page {page} of {source.name} for '{term}' holds no new listings, stopping")
+                    self.incomplete.add(source.family or source.name)
+                    break
+            else:
+                self.incomplete.add(source.family or source.name)
+
+    def search_source(self, source: SourceDefinition) -> Iterator[Listing]:
+        """Search one source for every search term"""
+        print(f"Searching {source.name}...")
+        if source.page_url:
+            # Paginated sources stop by themselves, so only max_pages bounds them
+            return self.crawl_pages(source)
+        # The limit decides every fetch: reading ahead would fetch (and, on SerpAPI, pay for) pages past it
+        listings = parse_pages(source, self.fetch_pages(source), self.parse_pool, ahead=0)
+        if (source.family or source.name) in self.full_pass:
+            return listings
+        return limit(listings, self.config.get('max_results_per_source', 10), source.name,
+                     lambda: self.incomplete.add(source.family or source.name))
+
+    def search(self, sources: List[SourceDefinition]) -> int:
+        """Search the given sources as one run and store what they find; returns the run id"""
+        run_id = self.store.start_run(self.clock())
+        self.run_id = run_id
+        self.found_count = 0
+        self.new_items = []
+        self.incomplete = set()
+        found_families = set()
+        searched = {source.family or source.name for source in sources}
+        # Early stops and the result limit keep most runs from reading a family in full, so every
+        # family gets a run that ignores both now and then
+        full_pass_hours = self.config.get('pagination', {}).get('full_pass_hours', 168)
+        self.full_pass = set()
+        if full_pass_hours:
+            self.full_pass = self.store.full_pass_due(searched, self.clock() - timedelta(hours=full_pass_hours))
+        if self.full_pass:
+            print(f"Full pass over {', '.join(sorted(self.full_pass))}: no early stops or result limits")
+        # Run searches based on config, then store results in source order
+        # so the output is the same whatever the concurrency mode
         try:
-            for term in self.config['search_terms']:
-                # Etsy search URL structure
-                search_url = f"https://www.etsy.com/search?q={term.replace(' ', '+')}"
-                print(f"  Searching Etsy for: {term}")
-                response = requests.get(search_url, headers=headers, timeout=10)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-
-                    # Etsy uses data-listing-id attributes
-                    listings = soup.find_all('div', {'data-listing-id': True})
-                    if not listings:
-                        # Fallback to other common patterns
-                        listings = soup.find_all('div', class_=re.compile('listing'))
-
-                    print(f"  Found {len(listings)} listings on Etsy for '{term}' (Note: Etsy uses JavaScript, may show 0)")
-
-                    for listing in listings[:10]:
-                        try:
-                            title_elem = listing.find('h3')
-                            if not title_elem:
-                                title_elem = listing.find('h2')
-
-                            link_elem = listing.find('a', href=True)
-                            price_elem = listing.find('span', class_=re.compile('price'))
-
-                            if title_elem and link_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = link_elem['href']
-                                if not url.startswith('http'):
-                                    url = 'https://www.etsy.com' + url
-                                price = price_elem.get_text(strip=True) if price_elem else 'N/A'
-
-                                item = {
-                                    'id': self.generate_item_id(title, url),
-                                    'title': title,
-                                    'url': url,
-                                    'price': price,
-                                    'source': 'Etsy'
-                                }
-
-                                if not self.is_item_seen(item['id']):
-                                    self.results.append(item)
-                                    self.mark_item_seen(item)
-                        except Exception as e:
-                            print(f"Error parsing Etsy listing: {e}")
-                            continue
-
-                time.sleep(2)
+            listings = self.run_sources(sources)
+            for stage in self.stages:
+                listings = stage(listings)
+            # One write transaction per batch
+            for batch in batched(listings, self.batch_size):
+                for item, is_new in zip(batch, self.mark_items_seen(batch, run_id)):
+                    self.found_count += 1
+                    found_families.add(item.source_family)
+                    print(f"  ✓ Item found: {item.title[:50]}...")
+                    if is_new:
+                        self.new_items.append(item)
+
+            # A family that returned nothing was most likely down rather than sold out
+            self.store.record_families(run_id, searched, (searched & found_families) - self.incomplete,
+                                       self.full_pass)
+            self.price_drops = self.store.price_drops(run_id)
+            self.gone_items = self.store.gone_items(run_id)
+        finally:
+            self.store.finish_run(run_id, self.clock(), self.found_count, len(self.new_items))
+        if self.notifier:
+            self.notifier.notify(run_id)
+        return run_id
+
+    def close(self):
+        # Queued digests still read the store
+        if self.notifier:
+            self.notifier.close()
+        self.store.close()
+        if self.http.recorder:
+            self.http.recorder.save()
+        self.http.close()
+        self.parse_pool.close()
 
-        except Exception as e:
-            print(f"Error searching Etsy: {e}")
-
-    
     def run(self):
         """Run all searches and send results"""
         print(f"Starting vintage coat search at {datetime.now()}")
         print(f"Search terms: {self.config['search_terms']}")
-        
-        # Run searches based on config
-        # Google Shopping first - most varied results from 50+ stores
-        if self.config.get('search_google_shopping', True):
-            self.search_google_shopping()
-
-        if self.config.get('search_kleinanzeigen', True):
-            self.search_kleinanzeigen()
-
-        if self.config.get('search_ebay', True):
-            self.search_ebay()
 
-        if self.config.get('search_ebay_uk', True):
-            self.search_ebay_uk()
-
-        if self.config.get('search_vinted', True):
-            self.search_vinted()
-
-        if self.config.get('search_google', True):
-            self.search_google()
-
-        if self.config.get('search_vintage_threads', True):
-            self.search_vintage_threads()
-
-        if self.config.get('search_vilis_vintage', True):
-            self.search_vilis_vintage()
-
-        if self.config.get('search_etsy', True):
-            self.search_etsy()
-
-        print(f"\nSearch complete. Found {len(self.results)} items.")
+        try:
+            self.search(self.get_sources())
+            history = self.store.compact(self.clock(), self.config.get('history', {}).get('retention_days'))
+        finally:
+            self.close()
+
+        print(f"\nSearch complete. Found {self.found_count} items, {len(self.new_items)} new since the last run.")
+        for item in self.price_drops:
+            print(f"  ↓ Price drop: {item['title'][:50]} ({item['old_price']} → {item['price']})")
+        print(f"{len(self.gone_items)} items no longer listed; history holds {history['remaining']} observations")
+        print(f"Made {self.http.request_count} HTTP requests ({self.http.cache_hits} served from cache)")
+        for source, stats in parse_stats.summary().items():
+            print(f"  Parsed {stats['pages']} {source} pages ({stats['bytes'] / 1024:.0f} KB) in {stats['seconds'] * 1000:.0f} ms")
+
+    def poll(self, sources: List[SourceDefinition]):
+        """One daemon cycle: search the due sources and report what is new"""
+        started = time.monotonic()
+        self.search(sources)
+        print(f"[{datetime.now():%Y-%m-%d %H:%M}] Polled {', '.join(source.name for source in sources)}: "
+              f"{self.found_count} items, {len(self.new_items)} new ({time.monotonic() - started:.0f}s)")
+        for item in self.new_items:
+            print(f"  ★ New: {item.title[:60]} - {item.price} ({item.source}) {item.url}")
+        for item in self.price_drops:
+            print(f"  ↓ Price drop: {item['title'][:50]} ({item['old_price']} → {item['price']})")
+
+    def daemon(self, stop: Optional[threading.Event] = None):
+        """Poll every source on its own interval until SIGTERM, SIGINT or `stop` is set
+
+        The HTTP pools, parser processes and database connection stay open
+        between polls. Sources due at the same time are polled as one run.
+        """
+        settings = self.config.get('daemon', {})
+        default_minutes = settings.get('interval_minutes', 60)
+        intervals = settings.get('intervals', {})
+        jitter = settings.get('jitter', 0.1)
+        compact_every = settings.get('compact_hours', 24) * 3600
+        stop = stop or threading.Event()
+        rng = random.Random()
+
+        def next_due(source: SourceDefinition) -> float:
+            # Jitter keeps polls from settling into a fixed pattern against each site
+            minutes = intervals.get(source.key, default_minutes)
+            return time.monotonic() + minutes * 60 * rng.uniform(1 - jitter, 1 + jitter)
+
+        # (due, position in source order, source); everything is due at startup
+        due = [(time.monotonic(), position, source) for position, source in enumerate(self.get_sources())]
+        heapq.heapify(due)
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                handlers[signum] = signal.signal(signum, lambda *_: stop.set())
+
+        print(f"Daemon polling {len(due)} sources, Ctrl-C or SIGTERM to stop")
+        compacted = time.monotonic()
+        try:
+            while due and not stop.is_set():
+                wait = due[0][0] - time.monotonic()
+                if wait > 0:
+                    stop.wait(wait)
+                    continue
+                now = time.monotonic()
+                ready = []
+                while due and due[0][0] <= now:
+                    ready.append(heapq.heappop(due))
+                ready.sort(key=lambda entry: entry[1])
+                try:
+                    self.poll([source for _, _, source in ready])
+                    if time.monotonic() - compacted >= compact_every:
+                        self.store.compact(self.clock(), self.config.get('history', {}).get('retention_days'))
+                        compacted = time.monotonic()
+                except Exception as e:
+                    # A failed poll is retried on the sources' next turn rather than ending the daemon
+                    print(f"⚠ Poll failed: {e}")
+                for _, position, source in ready:
+                    heapq.heappush(due, (next_due(source), position, source))
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            self.close()
+        print("Daemon stopped")
+
+
+def compact(config_path: str):
+    """Compact the listing history outside of a search run"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    store = ItemStore('seen_items.db', config.get('currency'))
+    try:
+        stats = store.compact(datetime.now(), config.get('history', {}).get('retention_days'))
+    finally:
+        store.close()
+    print(f"✓ Merged {stats['merged']} unchanged and expired {stats['expired']} old observations, "
+          f"{stats['remaining']} left")
+
+
+def query(config_path: str, text: str, source: Optional[str] = None, min_price: Optional[float] = None,
+          max_price: Optional[float] = None, limit: int = 20):
+    """Print the stored listings best matching `text`"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    store = ItemStore('seen_items.db', config.get('currency'))
+    try:
+        start = time.perf_counter()
+        matches = store.search(text, source,
+                               None if min_price is None else round(min_price * 100),
+                               None if max_price is None else round(max_price * 100), limit)
+        elapsed = time.perf_counter() - start
+    finally:
+        store.close()
+    for n, item in enumerate(matches, 1):
+        print(f"{n:3}. {item['title']} - {item['price'] or 'no price'} ({item['source']})")
+        print(f"     {item['url']}")
+    print(f"{len(matches)} matches in {elapsed * 1000:.1f} ms")
+
+
+def serve(config_path: str, host: str, port: int, site_dir: str, poll: bool):
+    """Serve the site with the live listing API, optionally polling the sources in the same process"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    server = FeedServer('seen_items.db', (host, port), site_dir, config.get('currency'))
+    print(f"Serving {site_dir} with the listing API on http://{host}:{port}/")
+    try:
+        if poll:
+            threading.Thread(target=server.serve_forever, name='feed-server', daemon=True).start()
+            VintageCoatFinder(config_path, polling=True).daemon()
+        else:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Search for vintage coats')
+    parser.add_argument('--config', default='config.json', help='path to config.json')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='ARCHIVE', help='save every HTTP exchange to a fixture archive')
+    mode.add_argument('--replay', metavar='ARCHIVE', help='serve HTTP responses from a fixture archive, offline')
+    parser.add_argument('--simulate-latency', action='store_true', help='with --replay, wait as long as the recorded requests took')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.add_parser('run', help='search every enabled source (the default)')
+    commands.add_parser('compact', help='compact the listing history and apply the retention window')
+    commands.add_parser('daemon', help='stay running and poll each source on its own interval')
+    feed = commands.add_parser('serve', help='serve the website with a live feed of new listings')
+    feed.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    feed.add_argument('--port', type=int, default=8000, help='port to listen on')
+    feed.add_argument('--site', default='.', help='directory holding index.html and data/')
+    feed.add_argument('--poll', action='store_true', help='also run the daemon in this process')
+    search = commands.add_parser('query', help='search the stored listings, best matches first')
+    search.add_argument('text', nargs='+', help='words the title must contain')
+    search.add_argument('--source', help='only this source or source family, e.g. eBay')
+    search.add_argument('--min-price', type=float, help='lowest price, in the base currency')
+    search.add_argument('--max-price', type=float, help='highest price, in the base currency')
+    search.add_argument('--limit', type=int, default=20, help='number of matches to show')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compact':
+        compact(args.config)
+        return
+    if args.command == 'query':
+        query(args.config, ' '.join(args.text), args.source, args.min_price, args.max_price, args.limit)
+        return
+
+    if args.command == 'serve':
+        if args.record or args.replay:
+            parser.error('serve cannot be combined with --record or --replay')
+        serve(args.config, args.host, args.port, args.site, args.poll)
+        return
+    if args.command == 'daemon':
+        if args.record or args.replay:
+            parser.error('daemon cannot be combined with --record or --replay')
+        VintageCoatFinder(args.config, polling=True).daemon()
+        return
+
+    finder = VintageCoatFinder(args.config, record=args.record, replay=args.replay,
+                               simulate_latency=args.simulate_latency)
+    finder.run()
 
 
 if __name__ == '__main__':
-    finder = VintageCoatFinder()
-    finder.run()
+    main()
@@ -0,0 +1,327 @@
+"""
+Declarative source definitions and the engine that extracts listings from them
+
+Every site is described by a SourceDefinition: where to search, which parts of
+the page hold listings and which CSS selectors pick out title, link, price and
+image. Extra sources can be added under "sources" in config.json without any
+new code.
+"""
+import json
+import re
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus, urljoin, urlsplit
+
+import soupsieve
+from bs4 import SoupStrainer
+
+from parsing import parse_page
+
+
+@dataclass(frozen=True)
+class SourceDefinition:
+    key: str                                   # enabled by "search_<key>" in config.json
+    name: str                                  # label stored with every item
+    url: str                                   # search URL, {query} is the quoted search term
+    page_url: str = ''                         # later result pages, {page} is the page number; '' = one page
+    base_url: str = ''                         # for resolving relative links
+    kind: str = 'html'                         # 'html' or 'serpapi'
+    family: str = ''                           # groups related sources (eBay, eBay UK), defaults to name
+    query: str = '{term}'                      # how a search term becomes the query
+    # Listing containers, tried in order until one matches: {"strain": {...}, "select": "css"}
+    listings: Tuple[Dict, ...] = ()
+    title: Tuple[str, ...] = ()                # CSS selectors, first match wins
+    link: Tuple[str, ...] = ('a[href]',)
+    price: Tuple[str, ...] = ()
+    image: Tuple[str, ...] = ('img',)
+    skip_titles: Tuple[str, ...] = ()          # lowercase titles of non-listing cards
+    skip_urls: Tuple[str, ...] = ()            # drop listings whose URL contains any of these
+    max_per_term: Optional[int] = None
+    timeout: float = 10
+    params: Dict = field(default_factory=dict)  # extra query parameters (serpapi)
+
+    @property
+    def config_key(self) -> str:
+        return f'search_{self.key}'
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).netloc
+
+    def search_url(self, term: str, page: int = 1) -> str:
+        query = self.query.format(term=term)
+        template = self.page_url if page > 1 else self.url
+        return template.format(query=quote_plus(query), raw_query=query, page=page)
+
+    @classmethod
+    def from_config(cls, entry: Dict) -> 'SourceDefinition':
+        """Build a definition from a config.json entry, turning lists into tuples"""
+        known = {f.name for f in fields(cls)}
+        unknown = set(entry) - known
+        if unknown:
+            raise ValueError(f"Unknown fields in source {entry.get('key')}: {', '.join(sorted(unknown))}")
+        values = {name: tuple(value) if isinstance(value, list) else value for name, value in entry.items()}
+        return cls(**values)
+
+
+EBAY_SELECTORS = {
+    'listings': ({'strain': {'name': 'ul', 'class': 'srp-results'}, 'select': 'ul.srp-results > li.s-card'},),
+    'title': ('div[class*="title" i]',),
+    'link': ('a[href*="/itm/"]',),
+    'price': ('span[class*="price"]',),
+    'timeout': 30,
+}
+
+SHOP_SELECTORS = {
+    'listings': (
+        {'strain': {'name': 'div', 'class': ['product-item', 'product', 'item']},
+         'select': 'div.product-item, div.product, div.item'},
+        {'strain': {'name': 'article'}, 'select': 'article'},
+    ),
+    'title': (
+        ':is(h2, h3, h4):is([class*="product"], [class*="title"], [class*="name"])',
+        'a:is([class*="product"], [class*="title"])',
+    ),
+    'price': (':is(span, div, p)[class*="price"]',),
+    'max_per_term': 10,
+}
+
+# Built-in sources, in the order they are searched and stored
+BUILTIN_SOURCES = [
+    # Google Shopping first - most varied results from 50+ stores
+    SourceDefinition(
+        key='google_shopping',
+        name='Google Shopping',
+        kind='serpapi',
+        url='https://serpapi.com/search',
+        params={'tbm': 'shop', 'location': 'Germany', 'hl': 'en', 'gl': 'de'},
+        timeout=15,
+    ),
+    SourceDefinition(
+        key='kleinanzeigen',
+        name='Kleinanzeigen',
+        # Newest first is the default order
+        url='https://www.kleinanzeigen.de/s-kleidung-damen/c153?keywords={query}',
+        page_url='https://www.kleinanzeigen.de/s-kleidung-damen/seite:{page}/c153?keywords={query}',
+        base_url='https://www.kleinanzeigen.de',
+        listings=({'strain': {'name': 'article', 'class': 'aditem'}, 'select': 'article.aditem'},),
+        title=('a.ellipsis',),
+        link=('a.ellipsis',),
+        price=('p.aditem-main--middle--price-shipping--price',),
+    ),
+    SourceDefinition(
+        key='ebay',
+        name='eBay',
+        url='https://www.ebay.de/sch/i.html?_nkw={query}&_sacat=11450&_sop=10',
+        page_url='https://www.ebay.de/sch/i.html?_nkw={query}&_sacat=11450&_sop=10&_pgn={page}',
+        skip_titles=('shop on ebay', 'ergebnisse'),
+        **EBAY_SELECTORS,
+    ),
+    SourceDefinition(
+        key='ebay_uk',
+        name='eBay UK',
+        family='eBay',
+        url='https://www.ebay.co.uk/sch/i.html?_nkw={query}&_sacat=11450&_sop=10',
+        page_url='https://www.ebay.co.uk/sch/i.html?_nkw={query}&_sacat=11450&_sop=10&_pgn={page}',
+        skip_titles=('shop on ebay', 'results'),
+        **EBAY_SELECTORS,
+    ),
+    SourceDefinition(
+        key='vinted',
+        name='Vinted',
+        url='https://www.vinted.de/vetements?search_text={query}',
+        base_url='https://www.vinted.de',
+        listings=({'strain': {'name': 'div', 'class': 'feed-grid__item'}, 'select': 'div.feed-grid__item'},),
+        title=('h3',),
+        price=('span.price',),
+        max_per_term=10,
+    ),
+    SourceDefinition(
+        key='google',
+        name='Google Search',
+        url='https://www.google.com/search?q={query}&num=10',
+        query='{term} vintage coat berlin',
+        listings=({'strain': {'name': 'div', 'class': 'g'}, 'select': 'div.g'},),
+        title=('h3',),
+        skip_urls=('google.com', 'youtube.com'),
+        max_per_term=5,
+    ),
+    SourceDefinition(
+        key='vintage_threads',
+        name='Vintage Threads',
+        url='https://vintage-threads.com/search?q={query}',
+        base_url='https://vintage-threads.com',
+        **SHOP_SELECTORS,
+    ),
+    SourceDefinition(
+        key='vilis_vintage',
+        name='Vilis Vintage',
+        url='https://www.vilisvintage.com/search?q={query}',
+        base_url='https://www.vilisvintage.com',
+        **SHOP_SELECTORS,
+    ),
+    SourceDefinition(
+        key='etsy',
+        name='Etsy',
+        url='https://www.etsy.com/search?q={query}&order=date_desc',
+        page_url='https://www.etsy.com/search?q={query}&order=date_desc&page={page}',
+        base_url='https://www.etsy.com',
+        listings=(
+            {'strain': {'name': 'div', 'attrs': {'data-listing-id': True}}, 'select': 'div[data-listing-id]'},
+            {'strain': {'name': 'div', 'class_contains': 'listing'}, 'select': 'div[class*="listing"]'},
+        ),
+        title=('h3', 'h2'),
+        price=('span[class*="price"]',),
+    ),
+]
+
+
+@dataclass(slots=True)
+class Listing:
+    """One listing as found on a search page"""
+    title: str
+    url: str
+    price: str
+    source: str                                # label stored with the item
+    source_family: str = ''                     # looked up from the label when empty
+    image_url: str = ''
+    id: str = ''                               # from the canonical URL, set by the pipeline
+
+
+def load_sources(config: Dict) -> List[SourceDefinition]:
+    """Built-in sources plus those under "sources" in config.json; same key replaces a built-in"""
+    sources = {source.key: source for source in BUILTIN_SOURCES}
+    for entry in config.get('sources', []):
+        source = SourceDefinition.from_config(entry)
+        sources[source.key] = source
+    for source in sources.values():
+        compile_source(source)
+    return list(sources.values())
+
+
+@lru_cache(maxsize=None)
+def source_family(label: str) -> str:
+    """Family of a stored source label, for items saved before families were recorded"""
+    name = label.split(' (', 1)[0]  # "Google Shopping (Zalando)" is a Google Shopping result
+    return next((source.family or source.name for source in BUILTIN_SOURCES if source.name == name), name)
+
+
+@lru_cache(maxsize=None)
+def compile_selector(selector: str):
+    """Compile a CSS selector once per process"""
+    return soupsieve.compile(selector)
+
+
+def _class_pattern(classes) -> re.Pattern:
+    """Match any of `classes` as a whole token of a raw class attribute
+
+    Strainers see the unsplit attribute while parsing ("srp-results srp-list"),
+    and newer bs4 releases no longer match a single class against it.
+    """
+    if isinstance(classes, str):
+        classes = [classes]
+    return re.compile(r'(?:^|\s)(?:%s)(?:\s|$)' % '|'.join(re.escape(c) for c in classes))
+
+
+@lru_cache(maxsize=None)
+def _strainer(spec: str) -> SoupStrainer:
+    spec = json.loads(spec)
+    attrs = dict(spec.get('attrs', {}))
+    if 'class' in spec:
+        attrs['class'] = _class_pattern(spec['class'])
+    if 'class_contains' in spec:
+        attrs['class'] = re.compile(re.escape(spec['class_contains']))
+    return SoupStrainer(spec.get('name'), attrs=attrs)
+
+
+def build_strainer(spec: Dict) -> SoupStrainer:
+    """SoupStrainer for a listing container spec"""
+    return _strainer(json.dumps(spec, sort_keys=True))
+
+
+def compile_source(source: SourceDefinition):
+    """Compile every selector of a source up front, so typos fail at startup"""
+    for pattern in source.listings:
+        compile_selector(pattern['select'])
+        build_strainer(pattern.get('strain', {}))
+    for selector in source.title + source.link + source.price + source.image:
+        compile_selector(selector)
+
+
+def _select_one(element, selectors: Tuple[str, ...]):
+    for selector in selectors:
+        match = compile_selector(selector).select_one(element)
+        if match is not None:
+            return match
+    return None
+
+
+def parse_listings(source: SourceDefinition, content: bytes) -> List[Listing]:
+    """Extract the listings from one search response"""
+    if source.kind == 'serpapi':
+        return parse_serpapi(source, content)
+
+    listings = []
+    for pattern in source.listings:
+        soup = parse_page(content, source.name, build_strainer(pattern.get('strain', {})))
+        listings = compile_selector(pattern['select']).select(soup)
+        if listings:
+            break
+
+    items = []
+    for listing in listings[:source.max_per_term]:
+        try:
+            title_elem = _select_one(listing, source.title)
+            link_elem = _select_one(listing, source.link)
+            if not (title_elem and link_elem):
+                continue
+
+            title = title_elem.get_text(strip=True)
+            if title.lower() in source.skip_titles:
+                continue
+            url = urljoin(source.base_url, link_elem['href'])
+            if any(skip in url.lower() for skip in source.skip_urls):
+                continue
+
+            price_elem = _select_one(listing, source.price)
+            image_url = ''
+            img_elem = _select_one(listing, source.image)
+            if img_elem:
+                image_url = img_elem.get('src', '') or img_elem.get('data-src', '')
+
+            items.append(Listing(
+                title=title,
+                url=url,
+                price=price_elem.get_text(strip=True) if price_elem else 'N/A',
+                source=source.name,
+                source_family=source.family or source.name,
+                image_url=image_url,
+            ))
+        except Exception as e:
+            print(f"  Error parsing {source.name} listing: {e}")
+            continue
+    return items
+
+
+def parse_serpapi(source: SourceDefinition, content: bytes) -> List[Listing]:
+    """Extract products from a SerpAPI Google Shopping response"""
+    items = []
+    for idx, result in enumerate(json.loads(content).get('shopping_results', [])):
+        try:
+            link = result.get('product_link', '')  # SerpAPI uses 'product_link', not 'link'
+            if not link:
+                print(f"  DEBUG: Skipping item {idx} - no product_link")
+                continue
+            items.append(Listing(
+                title=result.get('title', 'No title'),
+                url=link,
+                price=result.get('price', 'N/A'),
+                source=f"{source.name} ({result.get('source', 'Unknown Store')})",
+                source_family=source.family or source.name,
+                image_url=result.get('thumbnail', ''),
+            ))
+        except Exception as e:
+            print(f"  Error parsing {source.name} result: {e}")
+            continue
+    return items
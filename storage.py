@@ -0,0 +1,574 @@
+"""
+Persistent store of every item ever seen, updated incrementally each run
+"""
+import bisect
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import dedup
+from prices import PriceNormalizer, parse_price
+from sources import Listing, source_family
+
+# Ids per SELECT ... IN (...) when looking up a batch, below SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+# Columns added by the first migration, created on databases from before it
+ADDED_COLUMNS = {
+    'first_seen': 'TEXT',
+    'last_seen': 'TEXT',
+    'first_seen_run': 'INTEGER',
+    'last_seen_run': 'INTEGER',
+}
+
+# Porter stems English plurals ("coats"); unicode61 folds accents, so "Mäntel" also matches "mantel"
+SEARCH_TOKENIZER = 'porter unicode61 remove_diacritics 2'
+# German transcriptions of umlauts, indexed as a second column so "maentel" finds "Mäntel" too;
+# NULL for titles without umlauts, which keeps the index and the ranking work small
+FOLDED_TITLE = "NULLIF(replace(replace(replace(replace(replace(replace(replace({0}, 'ä', 'ae'), 'ö', 'oe'), " \
+               "'ü', 'ue'), 'Ä', 'Ae'), 'Ö', 'Oe'), 'Ü', 'Ue'), 'ß', 'ss'), {0})"
+
+
+def _migrate_run_tracking(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 1: items with first/last seen, and the runs that saw them"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seen_items (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            url TEXT,
+            price TEXT,
+            source TEXT,
+            found_date TEXT,
+            image_url TEXT
+        )
+    ''')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(seen_items)')}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f'ALTER TABLE seen_items ADD COLUMN {column} {column_type}')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT,
+            finished_at TEXT,
+            items_seen INTEGER DEFAULT 0,
+            items_new INTEGER DEFAULT 0
+        )
+    ''')
+    # Items first seen by the latest run: the delta for downstream stages
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS new_this_run AS
+        SELECT * FROM seen_items
+        WHERE first_seen_run = (SELECT MAX(id) FROM runs)
+    ''')
+
+
+def _migrate_normalized_columns(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 2: numeric price, currency and source family, plus indexes for the website queries"""
+    conn.execute('ALTER TABLE seen_items ADD COLUMN price_cents INTEGER')
+    conn.execute('ALTER TABLE seen_items ADD COLUMN currency TEXT')
+    conn.execute('ALTER TABLE seen_items ADD COLUMN source_family TEXT')
+    conn.execute('CREATE INDEX idx_seen_items_found_date ON seen_items (found_date)')
+    conn.execute('CREATE INDEX idx_seen_items_source ON seen_items (source)')
+
+    rows = conn.execute('SELECT id, price, source FROM seen_items').fetchall()
+    conn.executemany(
+        'UPDATE seen_items SET price_cents = ?, currency = ?, source_family = ? WHERE id = ?',
+        (parse_price(price) + (source_family(source), item_id) for item_id, price, source in rows)
+    )
+
+
+def _migrate_base_prices(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 3: price in the base currency and a negotiable flag, for numeric sorting and filtering"""
+    conn.execute('ALTER TABLE seen_items ADD COLUMN price_base_cents INTEGER')
+    conn.execute('ALTER TABLE seen_items ADD COLUMN negotiable INTEGER DEFAULT 0')
+    conn.execute('CREATE INDEX idx_seen_items_price_base_cents ON seen_items (price_base_cents)')
+
+    rows = conn.execute('SELECT id, price FROM seen_items').fetchall()
+    updates = []
+    for item_id, text in rows:
+        price = prices.normalize(text)
+        updates.append((price.cents, price.currency, price.base_cents, price.negotiable, item_id))
+    conn.executemany(
+        'UPDATE seen_items SET price_cents = ?, currency = ?, price_base_cents = ?, negotiable = ? WHERE id = ?',
+        updates
+    )
+
+
+def _migrate_dedup(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 4: ids from canonical URLs, merging duplicates, and SimHash clusters of near-duplicate titles"""
+    conn.execute('ALTER TABLE seen_items ADD COLUMN canonical_url TEXT')
+    conn.execute('ALTER TABLE seen_items ADD COLUMN simhash INTEGER')
+    conn.execute('ALTER TABLE seen_items ADD COLUMN cluster_id TEXT')
+    conn.execute('CREATE INDEX idx_seen_items_cluster_id ON seen_items (cluster_id)')
+    conn.execute('''
+        CREATE TABLE simhash_bands (
+            band INTEGER,
+            value INTEGER,
+            item_id TEXT,
+            simhash INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_simhash_bands ON simhash_bands (band, value)')
+
+    rows = conn.execute('''
+        SELECT id, title, url, last_seen, last_seen_run FROM seen_items ORDER BY found_date, rowid
+    ''').fetchall()
+    last_seen = {row[0]: (row[3] or '', row[4] or 0) for row in rows}
+    renames, duplicates = dedup.rekey([row[:3] for row in rows])
+    # A merged item was last seen whenever any of its copies was
+    for duplicate, original in duplicates.items():
+        seen, run = max(last_seen[original], last_seen[duplicate])
+        last_seen[original] = (seen, run)
+        conn.execute('UPDATE seen_items SET last_seen = ?, last_seen_run = ? WHERE id = ?', (seen, run, original))
+    conn.executemany('DELETE FROM seen_items WHERE id = ?', ((item_id,) for item_id in duplicates))
+    conn.executemany('UPDATE seen_items SET id = ? WHERE id = ?',
+                     ((new_id, old_id) for old_id, new_id in renames.items()))
+
+    index = dedup.ClusterIndex(conn)
+    rows = conn.execute('''
+        SELECT id, title, url, price_base_cents FROM seen_items ORDER BY found_date, rowid
+    ''').fetchall()
+    for start in range(0, len(rows), LOOKUP_CHUNK):
+        chunk = rows[start:start + LOOKUP_CHUNK]
+        assigned = index.assign_all([(item_id, title, price) for item_id, title, _, price in chunk])
+        conn.executemany('UPDATE seen_items SET canonical_url = ?, simhash = ?, cluster_id = ? WHERE id = ?',
+                         [(dedup.canonical_url(url), fingerprint, cluster_id, item_id)
+                          for (item_id, _, url, _), (fingerprint, cluster_id) in zip(chunk, assigned)])
+        index.written()
+
+
+def _migrate_history(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 5: observation log of every sighting, compacted into runs of unchanged price"""
+    conn.execute('''
+        CREATE TABLE observations (
+            item_id TEXT,
+            run_id INTEGER,
+            last_run_id INTEGER,
+            seen_at TEXT,
+            last_seen_at TEXT,
+            price TEXT,
+            price_base_cents INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_observations_item ON observations (item_id, run_id)')
+    conn.execute('CREATE INDEX idx_observations_run ON observations (run_id)')
+    conn.execute('CREATE INDEX idx_seen_items_last_seen_run ON seen_items (last_seen_run)')
+    # Earlier runs only kept the latest price, so history starts with one observation per item
+    conn.execute('''
+        INSERT INTO observations (item_id, run_id, last_run_id, seen_at, last_seen_at, price, price_base_cents)
+        SELECT id, first_seen_run, last_seen_run, first_seen, last_seen, price, price_base_cents FROM seen_items
+    ''')
+
+
+def _migrate_search(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 6: full-text index over titles, kept in sync with seen_items by triggers"""
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE items_fts USING fts5(item_id UNINDEXED, title, folded, tokenize = '{SEARCH_TOKENIZER}')
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER seen_items_fts_insert AFTER INSERT ON seen_items BEGIN
+            INSERT INTO items_fts (item_id, title, folded) VALUES (new.id, new.title, {FOLDED_TITLE.format('new.title')});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER seen_items_fts_update AFTER UPDATE OF id, title ON seen_items BEGIN
+            DELETE FROM items_fts WHERE item_id = old.id;
+            INSERT INTO items_fts (item_id, title, folded) VALUES (new.id, new.title, {FOLDED_TITLE.format('new.title')});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER seen_items_fts_delete AFTER DELETE ON seen_items BEGIN
+            DELETE FROM items_fts WHERE item_id = old.id;
+        END
+    ''')
+    conn.execute(f'''
+        INSERT INTO items_fts (item_id, title, folded) SELECT id, title, {FOLDED_TITLE.format('title')} FROM seen_items
+    ''')
+
+
+def _migrate_notifications(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 7: ledger of the items each recipient has been sent"""
+    conn.execute('''
+        CREATE TABLE notifications (
+            item_id TEXT,
+            recipient TEXT,
+            sent_at TEXT,
+            PRIMARY KEY (item_id, recipient)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_seen_items_first_seen_run ON seen_items (first_seen_run)')
+
+
+def _migrate_run_families(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 8: the source families each run searched, and whether it read all their listings"""
+    conn.execute('''
+        CREATE TABLE run_families (
+            run_id INTEGER,
+            source_family TEXT,
+            complete INTEGER,
+            PRIMARY KEY (run_id, source_family)
+        ) WITHOUT ROWID
+    ''')
+    # Earlier runs searched everything; every family they saw anything of counts as read in full
+    conn.execute('''
+        INSERT OR IGNORE INTO run_families (run_id, source_family, complete)
+        SELECT DISTINCT r.id, s.source_family, 1
+        FROM observations o
+        JOIN seen_items s ON s.id = o.item_id
+        JOIN runs r ON r.id BETWEEN o.run_id AND o.last_run_id
+    ''')
+
+
+def _migrate_full_passes(conn: sqlite3.Connection, prices: PriceNormalizer):
+    """Version 9: which runs searched a family in full, ignoring early stops and the result limit"""
+    conn.execute('ALTER TABLE run_families ADD COLUMN full_pass INTEGER DEFAULT 0')
+
+
+def match_query(text: str) -> Optional[str]:
+    """FTS5 query for listings containing every word of `text`, None if it has no words"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    # Quoted, so words like "and" or "near" aren't read as operators
+    return ' '.join(f'"{word}"' for word in words)
+
+
+# Applied in order; PRAGMA user_version records how many a database has had
+MIGRATIONS = [
+    _migrate_run_tracking,
+    _migrate_normalized_columns,
+    _migrate_base_prices,
+    _migrate_dedup,
+    _migrate_history,
+    _migrate_search,
+    _migrate_notifications,
+    _migrate_run_families,
+    _migrate_full_passes,
+]
+
+
+class ItemStore:
+    def __init__(self, db_path: str = 'seen_items.db', currency: Optional[Dict] = None):
+        """Open (or create) the items database; `currency` is config.json's rate table"""
+        self.db_path = db_path
+        self.prices = PriceNormalizer(currency)
+        # One connection for the whole run, shared by all threads under a lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.clusters = dedup.ClusterIndex(self.conn)
+        # WAL with synchronous=NORMAL syncs at checkpoints instead of on every commit
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.setup_database()
+
+    def setup_database(self):
+        """Bring the schema up to date, one migration per transaction"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+            self.conn.execute('BEGIN')
+            try:
+                migration(self.conn, self.prices)
+                self.conn.execute(f'PRAGMA user_version = {number}')
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            print(f"✓ Migrated {self.db_path} to schema version {number}")
+
+    def start_run(self, started_at: datetime) -> int:
+        """Record the start of a run and return its id"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute('INSERT INTO runs (started_at) VALUES (?)', (started_at.isoformat(),))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int, finished_at: datetime, items_seen: int, items_new: int):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE runs SET finished_at = ?, items_seen = ?, items_new = ? WHERE id = ?',
+                (finished_at.isoformat(), items_seen, items_new, run_id)
+            )
+
+    def record_families(self, run_id: int, searched: set, complete: set, full_pass: set = frozenset()):
+        """Record the families a run searched, which of them it read every listing of,
+        and which it searched as a full pass"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO run_families (run_id, source_family, complete, full_pass) VALUES (?, ?, ?, ?)',
+                [(run_id, family, family in complete, family in full_pass) for family in sorted(searched)]
+            )
+
+    def full_pass_due(self, families: set, since: datetime) -> set:
+        """Those of `families` no run started since `since` has searched as a full pass"""
+        with self.lock:
+            recent = {row[0] for row in self.conn.execute('''
+                SELECT DISTINCT f.source_family FROM run_families f JOIN runs r ON r.id = f.run_id
+                WHERE f.full_pass AND r.started_at >= ?
+            ''', (since.isoformat(),))}
+        return set(families) - recent
+
+    def is_item_seen(self, item_id: str) -> bool:
+        """Whether an item was stored by this or any earlier run"""
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM seen_items WHERE id = ?', (item_id,)).fetchone() is not None
+
+    def seen_ids(self, ids: List[str], before_run: Optional[int] = None) -> set:
+        """Those of `ids` stored by any run, or only by runs before `before_run`"""
+        with self.lock:
+            if before_run is None:
+                return self._known_ids(ids)
+            seen = set()
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(f'''
+                    SELECT id FROM seen_items WHERE id IN ({placeholders}) AND COALESCE(first_seen_run, 0) < ?
+                ''', chunk + [before_run])
+                seen.update(row[0] for row in rows)
+            return seen
+
+    def mark_item_seen(self, item: Listing, run_id: int, seen_at: datetime) -> bool:
+        """Insert a new item or refresh a known one. Returns True if the item is new"""
+        return self.mark_items_seen([item], run_id, seen_at)[0]
+
+    def _known_ids(self, ids: List[str]) -> set:
+        known = set()
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(f'SELECT id FROM seen_items WHERE id IN ({placeholders})', chunk)
+            known.update(row[0] for row in rows)
+        return known
+
+    def mark_items_seen(self, items: List[Listing], run_id: int, seen_at: datetime) -> List[bool]:
+        """Store a batch of items in one transaction. Returns whether each item is new"""
+        seen_at = seen_at.isoformat()
+        with self.lock, self.conn:
+            try:
+                return self._write_batch(items, run_id, seen_at)
+            finally:
+                self.clusters.written()
+
+    def _write_batch(self, items: List[Listing], run_id: int, seen_at: str) -> List[bool]:
+        known = self._known_ids([item.id for item in items])
+        flags, prices = [], []
+        for item in items:
+            flags.append(item.id not in known)
+            known.add(item.id)
+            prices.append(self.prices.normalize(item.price))
+        # Near-duplicates of every new item are looked up together
+        clusters = iter(self.clusters.assign_all([
+            (item.id, item.title, price.base_cents) for item, price, is_new in zip(items, prices, flags) if is_new
+        ]))
+
+        inserts, updates, observations = [], [], []
+        for item, price, is_new in zip(items, prices, flags):
+            text = item.price
+            observations.append((item.id, run_id, run_id, seen_at, seen_at, text, price.base_cents))
+            if is_new:
+                fingerprint, cluster_id = next(clusters)
+                inserts.append((
+                    item.id,
+                    item.title,
+                    item.url,
+                    text,
+                    item.source,
+                    seen_at,
+                    item.image_url,
+                    seen_at,
+                    seen_at,
+                    run_id,
+                    run_id,
+                    price.cents,
+                    price.currency,
+                    item.source_family or source_family(item.source),
+                    price.base_cents,
+                    price.negotiable,
+                    dedup.canonical_url(item.url),
+                    fingerprint,
+                    cluster_id
+                ))
+            else:
+                updates.append((
+                    text, price.cents, price.currency, price.base_cents, price.negotiable,
+                    item.image_url, seen_at, run_id, item.id
+                ))
+
+        self.conn.executemany('''
+            INSERT INTO seen_items
+                (id, title, url, price, source, found_date, image_url,
+                 first_seen, last_seen, first_seen_run, last_seen_run,
+                 price_cents, currency, source_family, price_base_cents, negotiable,
+                 canonical_url, simhash, cluster_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', inserts)
+        # Every sighting is logged; compact() folds unchanged ones together
+        self.conn.executemany('''
+            INSERT INTO observations (item_id, run_id, last_run_id, seen_at, last_seen_at, price, price_base_cents)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', observations)
+        # Known items keep their first-seen data and refresh what may have changed
+        self.conn.executemany('''
+            UPDATE seen_items
+            SET price = ?, price_cents = ?, currency = ?, price_base_cents = ?, negotiable = ?,
+                image_url = COALESCE(NULLIF(?, ''), image_url), last_seen = ?, last_seen_run = ?
+            WHERE id = ?
+        ''', updates)
+        return flags
+
+    def new_items(self, run_id: int) -> List[Dict]:
+        """Items first seen by the given run"""
+        with self.lock:
+            cursor = self.conn.execute('''
+                SELECT id, title, url, price, source, found_date, image_url
+                FROM seen_items WHERE first_seen_run = ? ORDER BY first_seen
+            ''', (run_id,))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def unnotified(self, recipient: str, since: datetime) -> List[Dict]:
+        """Items first seen by runs started since `since` that `recipient` hasn't been sent, oldest first"""
+        with self.lock:
+            cursor = self.conn.execute('''
+                SELECT id, title, url, price, source, source_family, price_base_cents, image_url, first_seen
+                FROM seen_items
+                WHERE first_seen_run >= (SELECT MIN(id) FROM runs WHERE started_at >= ?)
+                  AND NOT EXISTS (SELECT 1 FROM notifications n WHERE n.item_id = seen_items.id AND n.recipient = ?)
+                ORDER BY first_seen
+            ''', (since.isoformat(), recipient))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def record_notified(self, recipient: str, item_ids: List[str], sent_at: datetime):
+        """Add sent items to the ledger, so they are never sent to `recipient` again"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO notifications (item_id, recipient, sent_at) VALUES (?, ?, ?)',
+                [(item_id, recipient, sent_at.isoformat()) for item_id in item_ids]
+            )
+
+    def compact(self, now: datetime, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """Fold consecutive sightings at an unchanged price into one observation, and drop
+        observations last seen before the retention window
+
+        Sightings are consecutive unless a run in between read every listing of
+        the item's family; runs that searched other families, or stopped early,
+        say nothing about whether it was still listed.
+        """
+        with self.lock, self.conn:
+            complete_runs = {}
+            for run_id, family in self.conn.execute(
+                    'SELECT run_id, source_family FROM run_families WHERE complete ORDER BY run_id'):
+                complete_runs.setdefault(family, []).append(run_id)
+
+            merged, deleted = {}, []
+            # (rowid, item, price, last run, last seen) of the observation being extended
+            kept = None
+            rows = self.conn.execute('''
+                SELECT o.rowid, o.item_id, COALESCE(o.run_id, 0), COALESCE(o.last_run_id, 0),
+                       COALESCE(o.last_seen_at, ''), o.price, s.source_family
+                FROM observations o LEFT JOIN seen_items s ON s.id = o.item_id
+                ORDER BY o.item_id, o.run_id, o.rowid
+            ''')
+            for rowid, item_id, run_id, last_run_id, last_seen_at, price, family in rows:
+                # Same item and price, and no complete run of its family missed it in between: nothing changed
+                runs = complete_runs.get(family, [])
+                missed_by = bisect.bisect_right(runs, kept[3]) if kept else 0
+                if (kept and kept[1] == item_id and kept[2] == price
+                        and (missed_by == len(runs) or runs[missed_by] >= run_id)):
+                    kept = (kept[0], item_id, price, max(kept[3], last_run_id), max(kept[4], last_seen_at))
+                    merged[kept[0]] = kept[3:]
+                    deleted.append((rowid,))
+                else:
+                    kept = (rowid, item_id, price, last_run_id, last_seen_at)
+
+            self.conn.executemany('UPDATE observations SET last_run_id = ?, last_seen_at = ? WHERE rowid = ?',
+                                  ((run, seen, rowid) for rowid, (run, seen) in merged.items()))
+            self.conn.executemany('DELETE FROM observations WHERE rowid = ?', deleted)
+
+            expired = 0
+            if retention_days:
+                cutoff = (now - timedelta(days=retention_days)).isoformat()
+                expired = self.conn.execute('DELETE FROM observations WHERE last_seen_at < ?', (cutoff,)).rowcount
+            remaining = self.conn.execute('SELECT COUNT(*) FROM observations').fetchone()[0]
+        return {'merged': len(deleted), 'expired': expired, 'remaining': remaining}
+
+    def price_drops(self, run_id: int) -> List[Dict]:
+        """Items the given run saw at a lower price than the sighting before"""
+        with self.lock:
+            cursor = self.conn.execute('''
+                SELECT s.id, s.title, s.url, s.source, p.price AS old_price, o.price AS price,
+                       p.price_base_cents AS old_price_base_cents, o.price_base_cents AS price_base_cents
+                FROM observations o
+                JOIN observations p ON p.rowid = (
+                    SELECT rowid FROM observations
+                    WHERE item_id = o.item_id AND run_id < o.run_id
+                    ORDER BY run_id DESC LIMIT 1
+                )
+                JOIN seen_items s ON s.id = o.item_id
+                WHERE o.run_id = ? AND o.price_base_cents < p.price_base_cents
+                GROUP BY o.item_id
+                ORDER BY p.price_base_cents - o.price_base_cents DESC
+            ''', (run_id,))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def gone_items(self, run_id: int) -> List[Dict]:
+        """Items the given run should have seen but didn't
+
+        Each family the given run read every listing of is compared with the
+        last run before it that did the same, so daemon polls of other families
+        in between don't matter. A site that was down, or a crawl that stopped
+        at listings it already knew, doesn't look like every listing was sold.
+        """
+        with self.lock:
+            families = self.conn.execute('''
+                SELECT f.source_family, (SELECT MAX(p.run_id) FROM run_families p
+                                         WHERE p.source_family = f.source_family AND p.complete AND p.run_id < f.run_id)
+                FROM run_families f WHERE f.run_id = ? AND f.complete
+            ''', (run_id,)).fetchall()
+            gone = []
+            for family, previous in families:
+                if previous is None:
+                    continue
+                # Seen by that run, or by a partial one since, and not by this one
+                cursor = self.conn.execute('''
+                    SELECT id, title, url, price, source, first_seen, last_seen
+                    FROM seen_items
+                    WHERE last_seen_run >= ? AND last_seen_run < ? AND source_family = ?
+                ''', (previous, run_id, family))
+                columns = [column[0] for column in cursor.description]
+                gone += [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return sorted(gone, key=lambda item: item['last_seen'] or '', reverse=True)
+
+    def search(self, text: str, source: Optional[str] = None, min_price_cents: Optional[int] = None,
+               max_price_cents: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """Best matches for `text` by BM25 rank (FTS5's built-in rank column); prices in base currency cents, `source` a name or family"""
+        query = match_query(text)
+        if query is None:
+            return []
+        conditions, params = ['items_fts MATCH ?'], [query]
+        if source:
+            conditions.append('(s.source = ? COLLATE NOCASE OR s.source_family = ? COLLATE NOCASE)')
+            params += [source, source]
+        if min_price_cents is not None:
+            conditions.append('s.price_base_cents >= ?')
+            params.append(min_price_cents)
+        if max_price_cents is not None:
+            conditions.append('s.price_base_cents <= ?')
+            params.append(max_price_cents)
+        with self.lock:
+            cursor = self.conn.execute(f'''
+                SELECT s.id, s.title, s.url, s.price, s.price_base_cents, s.source, s.last_seen, items_fts.rank
+                FROM items_fts JOIN seen_items s ON s.id = items_fts.item_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY rank LIMIT ?
+            ''', params + [limit])
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        self.conn.close()